@@ -0,0 +1,108 @@
+import json
+from datetime import datetime
+from hashlib import sha1
+
+from flask import Blueprint, Response, request, stream_with_context
+from sqlalchemy import func, select
+
+import counters
+from models import db, Venue, Artist, Show, Watermark
+from purge import DELETES_WATERMARK
+from filters import filter_args, apply_filters
+from replicas import read_only
+from queries import (
+    venue_listing,
+    artist_listing,
+    show_listing,
+    VENUE_LISTING_ORDER,
+    ARTIST_LISTING_ORDER,
+    SHOW_LISTING_ORDER
+)
+
+#----------------------------------------------------------------------------#
+# Read-only JSON API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__)
+
+# rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+def to_json(row):
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in row._asdict().items()
+    }
+
+def collection_etag(mimetype, *models, watermarks=()):
+    '''
+    Fingerprint of the tables behind a collection, from index lookups only:
+    inserts move max(id), edits max(updated_at), and deletes, which move
+    neither, the purge.DELETES_WATERMARK watermark, plus any `watermarks`
+    of derived columns. The representation is part of it, as JSON and
+    NDJSON share a URL.
+    '''
+    parts = [
+        select(func.max(column)).scalar_subquery()
+        for model in models
+        for column in (model.id, model.updated_at)
+    ]
+    parts.extend(select(Watermark.value).where(Watermark.name == name).scalar_subquery()
+                 for name in (DELETES_WATERMARK,) + tuple(watermarks))
+    fingerprint = db.session.execute(select(*parts)).one()
+    return sha1(repr((mimetype,) + tuple(fingerprint)).encode()).hexdigest()
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+def stream_rows(query, mimetype):
+    # yield_per streams from a server-side cursor, so memory stays flat no
+    # matter how many rows the collection has
+    rows = db.session.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+    if mimetype == 'application/x-ndjson':
+        def ndjson():
+            for row in rows:
+                yield json.dumps(to_json(row)) + '\n'
+        return ndjson()
+
+    def array():
+        yield '['
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps(to_json(row))
+            separator = ','
+        yield ']'
+    return array()
+
+def collection(query, *models, watermarks=()):
+    mimetype = 'application/x-ndjson' if wants_ndjson() else 'application/json'
+    etag = collection_etag(mimetype, *models, watermarks=watermarks)
+    # the body depends on the Accept header as well as the URL
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    return Response(stream_with_context(stream_rows(query, mimetype)), mimetype=mimetype, headers=headers)
+
+@api.route('/shows')
+@read_only
+def shows():
+    # venue and artist names are part of every show row
+    return collection(show_listing().order_by(*SHOW_LISTING_ORDER), Show, Venue, Artist)
+
+@api.route('/venues')
+@read_only
+def venues():
+    query = apply_filters(venue_listing(), Venue, filter_args())
+    # num_upcoming_shows follows the show table (max(id) and updated_at
+    # of shows) and the counters watermark (rollovers), not venue edits
+    return collection(query.order_by(*VENUE_LISTING_ORDER), Venue, Show,
+                      watermarks=(counters.WATERMARK,))
+
+@api.route('/artists')
+@read_only
+def artists():
+    query = apply_filters(artist_listing(), Artist, filter_args())
+    return collection(query.order_by(*ARTIST_LISTING_ORDER), Artist)
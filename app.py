@@ -3,23 +3,58 @@
 #----------------------------------------------------------------------------#
 import dateutil.parser
 import babel
+import babel.dates
+import click
 from flask import (
     Flask, 
     render_template, 
     request, 
     flash, 
     redirect, 
-    url_for
+    url_for,
+    jsonify,
+    abort
 )
 from flask_moment import Moment
 from sqlalchemy import literal
+from sqlalchemy.exc import IntegrityError
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
 import sys
+from functools import lru_cache
 from models import  db, Venue, Artist, Show
+from queries import (
+    load_profile,
+    request_now,
+    entity_shows,
+    show_counterpart_ids,
+    venue_areas,
+    venue_listing,
+    artist_listing,
+    VENUE_LISTING_ORDER,
+    ARTIST_LISTING_ORDER
+)
+from pagination import keyset_page, page_args
+from search import search
+from filters import filter_args, apply_filters
+import counters
+import projection
+import matchmaking
+import scheduling
+import purge
+import explain
+from cache import PageCache
+from replicas import ReadReplicas, read_only
+from api import api
+from instrumentation import Instrumentation
+# limits the statement time of web requests, see serving.py
+import serving
+import bulk_import
+import batch
+import bulk_export
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -29,7 +64,13 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 migrate = Migrate(app, db)
+# choices for the filter forms on the listing and search pages
+app.jinja_env.globals.update(genres_choices=genres_choices, states_choices=states_choices)
 db.init_app(app)
+page_cache = PageCache(app)
+instrumentation = Instrumentation(app)
+replicas = ReadReplicas(app)
+app.register_blueprint(api, url_prefix='/api/v1')
 # app.url_map.strict_slashes = False
 #-----------------------------#
 # Create tables in the db from models
@@ -39,13 +80,25 @@ db.init_app(app)
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=64)
+def compiled_datetime_format(format, locale):
+  # Babel pattern parsing and locale loading happen once per (format, locale)
+  pattern = DATETIME_FORMATS.get(format, format)
+  return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # views pass datetimes straight from the database; strings are still accepted
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=babel.dates.UTC)
+  pattern, locale = compiled_datetime_format(format, locale)
+  return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
@@ -60,88 +113,56 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 @app.route('/venues')
-
+@read_only
+@page_cache.cached('venues')
 def venues():
-  data = []
-  venues = Venue.query.all()
-  if len(venues) == 0:
-    return render_template('errors/404.html')
-  # create a data structure to hold the venues data 
-  # so that data is a list of dictionaries, that lets us group the data by city, 
-  # and the key "venues" is associated 
-  # to a dicitonary as its values. 
-  for city in Venue.query.distinct(Venue.city).order_by(Venue.city).all():
-    cities_dic = {}
-    cities_dic["city"] = city.city
-    cities_dic["state"] = city.state
-    cities_dic["venues"] = []
-    data.append(cities_dic)
-
-  # populate the venues list for each city 
-  venues = [venue for venue in Venue.query.all()]
-  for venue in venues:
-    for sub in data:
-      if sub["city"] == venue.city:
-        sub_dic = {}
-        sub_dic["id"] = venue.id
-        sub_dic["name"] = venue.name
-        sub_dic["num_upcoming_shows"] = venue.num_upcoming_shows
-        sub["venues"].append(sub_dic)
-   
-  return render_template('pages/venues.html', areas=data)
+  # one keyset page of venues, grouped into areas, see queries.venue_areas
+  filters = filter_args()
+  page = keyset_page(apply_filters(venue_listing(), Venue, filters), VENUE_LISTING_ORDER, **page_args())
+  data = venue_areas(page["items"])
+
+  return render_template('pages/venues.html', areas=data, page=page, filters=filters)
 
 @app.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
   
-  response = {}
   data = []
   search_term = request.form.get('search_term', '')
-  results = [venue for venue in Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()]
-  for result in results:
+  page = request.form.get('page', 1, type=int)
+  # ranked and paginated, see search.search
+  filters = filter_args()
+  response = search(Venue, search_term, page=page, filters=filters)
+  for result in response["data"]:
     res_dic = {}
     res_dic["id"] = result.id
     res_dic["name"] = result.name
     res_dic["num_upcoming_shows"] = result.num_upcoming_shows
     data.append(res_dic)
     
-  response["count"] = len(results)
   response["data"] = data
 
   # search our database for records containing the search term 
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, filters=filters)
 
 @app.route('/venues/<int:venue_id>')
+@read_only
+@page_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
 
-  # query all tables and filter by show occurring previous than today's date, to get data for past shows
-  # individual venue query to show venues with no shows
-  venue = Venue.query.get_or_404(venue_id)
-
-  # this will run only if there are shows assigned to the venue 
-  past_shows = []
-  upcoming_shows = []
-
-  for show in venue.shows:
-    
-    temp_show = {
-        'artist_id': show.artist_id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': str(show.start_time)
-        }
-    if show.start_time <= datetime.now():
-        past_shows.append(temp_show)
-    else:
-        upcoming_shows.append(temp_show)
+  venue = Venue.query.options(*load_profile(Venue, 'detail')).get_or_404(venue_id)
 
   # object class to dict
   data = vars(venue)
 
-  data['past_shows'] = past_shows
-  data['upcoming_shows'] = upcoming_shows
-  data['past_shows_count'] = len(past_shows)
-  data['upcoming_shows_count'] = len(upcoming_shows)
-  ## handle error if no venue is returned. 
+  # upcoming and the most recent past shows, split at a single "now"
+  data.update(entity_shows(
+    venue, request_now(),
+    upcoming_limit=app.config['DETAIL_UPCOMING_SHOWS_LIMIT'],
+    past_limit=app.config['DETAIL_PAST_SHOWS_LIMIT']
+  ))
+  # precomputed by `flask compute-matches`
+  data["matches"] = matchmaking.recommendations('venue', venue_id, app.config['MATCHES_PER_ENTITY'])
 
   return render_template('pages/show_venue.html', venue=data)
 
@@ -178,15 +199,13 @@ def create_venue_submission():
                   seeking_talent = True if 'seeking_talent' in request.form else False,
                   seeking_description = request.form['seeking_description']
                   )
-      print(form.genres.data)
       db.session.add(new_venue)
       db.session.commit()
+      page_cache.invalidate('venues')
       flash('Venue ' + form.name.data + ' was created successfully ⭐')
-    except ValueError as e:
-      print(e)
+    except ValueError:
       db.session.rollback()
-      print(sys.exc_info())
-      print(sys.exc_info())
+      app.logger.exception('could not create %s', form.name.data)
     finally:
       db.session.close()
 
@@ -201,102 +220,110 @@ def create_venue_submission():
   return render_template('pages/home.html')
     
   
-@app.route('/venues/<int:venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
+def delete_entity(model, entity_id):
+  # one DELETE, the shows go with it through the cascading foreign keys
+  kind = purge.KIND_NAMES[model]
+  count = purge.show_count(model, entity_id)
+  if count is None:
+    abort(404)
+  counterpart = 'artist' if model is Venue else 'venue'
+  namespaces = [f'{kind}s', 'venues', 'shows', f'{kind}:{entity_id}',
+                *[f'{counterpart}:{id}' for id in show_counterpart_ids(model, entity_id)]]
+
+  threshold = app.config['PURGE_BACKGROUND_THRESHOLD']
+  if threshold is not None and count > threshold:
+    db.session.close()
+    purge.purge_in_background(app, model, entity_id, on_done=lambda: page_cache.invalidate(*namespaces))
+    return jsonify(deleted=False, purging=True), 202
 
   try:
-    venue = Venue.query.get(venue_id)
-    db.session.delete(venue)
+    deleted = purge.delete_entity(model, entity_id)
     db.session.commit()
+    if deleted:
+      page_cache.invalidate(*namespaces)
   except:
     db.session.rollback()
-    print(sys.exc_info())
-    flash('An error occurred. The venue could not be deleted')
+    app.logger.exception('%s failed', request.endpoint)
+    return jsonify(deleted=False, error=f'The {kind} could not be deleted'), 500
   finally:
-      db.session.close()
-      
-  return None
+    db.session.close()
+  if not deleted:
+    # deleted by a concurrent request since show_count() saw it
+    abort(404)
+  return jsonify(deleted=True)
+
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  return delete_entity(Venue, venue_id)
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@read_only
+@page_cache.cached('artists')
 def artists():
-  artists = Artist.query.all()
-  if len(artists) == 0:
-    return render_template('errors/404.html')
+  filters = filter_args()
+  page = keyset_page(apply_filters(artist_listing(), Artist, filters), ARTIST_LISTING_ORDER, **page_args())
   data = []
-  for artist in artists:
+  for artist in page["items"]:
     data.append({
       "id":artist.id,
       "name":artist.name
     })
 
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, page=page, filters=filters)
 
 @app.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
-  response = {}
   data = []
   search_term = request.form.get('search_term', '')
-  results = [artist for artist in Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()]
+  page = request.form.get('page', 1, type=int)
+  # ranked and paginated, see search.search
+  filters = filter_args()
+  response = search(Artist, search_term, page=page, filters=filters)
   
-  for result in results:
-    num_upcoming_shows = 0
-    upcoming_shows = Show.query.filter_by(artist_id=result.id).all()
-    for show in upcoming_shows:
-      if show.start_time >= datetime.now():
-        num_upcoming_shows += 1
+  for result in response["data"]:
     data.append({
       "id": result.id,
       "name": result.name,
-      "num_upcoming_shows":num_upcoming_shows
+      "num_upcoming_shows": result.num_upcoming_shows
     })
    
-  response["count"] = len(results)
   response["data"] = data
 
   # search our database for records containing the search term 
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, filters=filters)
 
 @app.route('/artists/<int:artist_id>')
+@read_only
+@page_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
   
-  joined_query_all_shows=db.session.query(Show).join(Artist).filter(Show.artist_id==artist_id).all()
-  artist = Artist.query.get_or_404(artist_id)
-  upcoming_shows = []
-  past_shows = []
+  artist = Artist.query.options(*load_profile(Artist, 'detail')).get_or_404(artist_id)
   data = vars(artist)
 
-  for show in artist.shows: 
-    print("venues", show.venue.genres)
-    print("artist", show.artist.genres)
-
-  for show in joined_query_all_shows:
-    shows_dic = {
-      "venue_id":show.venue.id,
-      "venue_image_link": show.venue.image_link,
-      "start_time": str(show.start_time)
-    }
-    # assign upcoming shows to variable
-    if show.start_time >= datetime.now():
-      upcoming_shows.append(shows_dic)
-    else:
-      past_shows.append(shows_dic)
-
-  data["past_shows"] = past_shows    
-  data["upcoming_shows"] = upcoming_shows
-  data["past_shows_count"] = len(past_shows)
-  data["upcoming_shows_count"] = len(upcoming_shows)
-
-  print(data["genres"])
+  # upcoming and the most recent past shows, split at a single "now"
+  data.update(entity_shows(
+    artist, request_now(),
+    upcoming_limit=app.config['DETAIL_UPCOMING_SHOWS_LIMIT'],
+    past_limit=app.config['DETAIL_PAST_SHOWS_LIMIT']
+  ))
+  # precomputed by `flask compute-matches`
+  data["matches"] = matchmaking.recommendations('artist', artist_id, app.config['MATCHES_PER_ENTITY'])
+
   return render_template('pages/show_artist.html', artist=data)
 
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  return delete_entity(Artist, artist_id)
+
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.options(*load_profile(Artist, 'detail')).get(artist_id)
   
   form.name.data = artist.name
   form.genres.data = artist.genres
@@ -314,25 +341,31 @@ def edit_artist(artist_id):
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   error = False 
-  artist = Artist.query.get(artist_id)
+  # only the id is looked up; the edit is a column-only UPDATE
+  Artist.query.with_entities(Artist.id).filter(Artist.id == artist_id).first_or_404()
   try: 
-    artist.name = request.form['name']
-    artist.city = request.form['city']
-    artist.state = request.form['state']
-    artist.phone = request.form['phone']
-    artist.genres = request.form.getlist('genres')
-    artist.image_link = request.form['image_link']
-    artist.facebook_link = request.form['facebook_link']
-    artist.website = request.form['website_link']
-    artist.seeking_venue = True if 'seeking_venue' in request.form else False 
-    artist.seeking_description = request.form['seeking_description']
+    batch.update(Artist, [(artist_id, {
+      'name': request.form['name'],
+      'city': request.form['city'],
+      'state': request.form['state'],
+      'phone': request.form['phone'],
+      'genres': request.form.getlist('genres'),
+      'image_link': request.form['image_link'],
+      'facebook_link': request.form['facebook_link'],
+      'website': request.form['website_link'],
+      'seeking_venue': True if 'seeking_venue' in request.form else False,
+      'seeking_description': request.form['seeking_description']
+    })])
 
     db.session.commit()
+    # the artist's name and picture also appear on show tiles
+    page_cache.invalidate('artists', 'shows', f'artist:{artist_id}',
+                          *[f'venue:{venue_id}' for venue_id in show_counterpart_ids(Artist, artist_id)])
 
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('%s failed', request.endpoint)
   finally: 
     db.session.close()
   if error: 
@@ -344,7 +377,7 @@ def edit_artist_submission(artist_id):
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   form = VenueForm()
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.options(*load_profile(Venue, 'detail')).get(venue_id)
   
   form.name.data = venue.name
   form.genres.data = venue.genres
@@ -363,27 +396,33 @@ def edit_venue(venue_id):
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   error = False 
-  venue = Venue.query.get(venue_id)
+  # only the id is looked up; the edit is a column-only UPDATE
+  Venue.query.with_entities(Venue.id).filter(Venue.id == venue_id).first_or_404()
   
   try: 
-    venue.name = request.form['name']
-    venue.city = request.form['city']
-    venue.state = request.form['state']
-    venue.address = request.form['address']
-    venue.phone = request.form['phone']
-    venue.genres = request.form.getlist('genres')
-    venue.image_link = request.form['image_link']
-    venue.facebook_link = request.form['facebook_link']
-    venue.website = request.form['website_link']
-    venue.seeking_talent = True if 'seeking_talent' in request.form else False 
-    venue.seeking_description = request.form['seeking_description']
+    batch.update(Venue, [(venue_id, {
+      'name': request.form['name'],
+      'city': request.form['city'],
+      'state': request.form['state'],
+      'address': request.form['address'],
+      'phone': request.form['phone'],
+      'genres': request.form.getlist('genres'),
+      'image_link': request.form['image_link'],
+      'facebook_link': request.form['facebook_link'],
+      'website': request.form['website_link'],
+      'seeking_talent': True if 'seeking_talent' in request.form else False,
+      'seeking_description': request.form['seeking_description']
+    })])
 
     db.session.commit()
+    # the venue's name and picture also appear on show tiles
+    page_cache.invalidate('venues', 'shows', f'venue:{venue_id}',
+                          *[f'artist:{artist_id}' for artist_id in show_counterpart_ids(Venue, venue_id)])
 
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('%s failed', request.endpoint)
   finally: 
     db.session.close()
   if error: 
@@ -424,15 +463,13 @@ def create_artist_submission():
                   seeking_venue = True if 'seeking_venue' in request.form else False,
                   seeking_description = request.form['seeking_description']
                   )
-      print(form.genres.data)
       db.session.add(new_artist)
       db.session.commit()
+      page_cache.invalidate('artists')
       flash('Artist ' + form.name.data + ' successfuly created ⭐')
-    except ValueError as e:
-      print(e)
+    except ValueError:
       db.session.rollback()
-      print(sys.exc_info())
-      print(sys.exc_info())
+      app.logger.exception('could not create %s', form.name.data)
     finally:
       db.session.close()
 
@@ -451,27 +488,28 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@read_only
+@page_cache.cached('shows')
 def shows():
-  # displays list of shows at /shows
-  
-
-  joined_query_all_shows=db.session.query(Show).join(Artist, Venue).all()  
-  if len(joined_query_all_shows) == 0:
-    return render_template('errors/404.html')
+  # upcoming shows from the projection, optionally between ?from= and ?to=
+  # dates, one keyset page at a time
+  start, end = projection.date_range_args()
+  page = keyset_page(projection.upcoming_listing(start, end, request_now()),
+                     projection.UPCOMING_LISTING_ORDER, **page_args())
   data = []
-  for show in joined_query_all_shows:
+  for show in page["items"]:
     data.append(
       {
-        "venue_id": show.venue.id,
-        "venue_name": show.venue.name,
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name,
         "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": str(show.start_time)
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "start_time": show.start_time
       }
     )
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, page=page)
 
 @app.route('/shows/create')
 def create_shows():
@@ -483,28 +521,219 @@ def create_shows():
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   error = False
+  conflict = None
+  found = []
   # obtain the data posted via the form and catch error if any 
-  form = ShowForm()
+  form = ShowForm(request.form, meta={'csrf': False})
+  # an out of range duration would store a show ending before it starts,
+  # or running past what scheduling.overlapping() looks back for
+  if not form.validate():
+    message = []
+    for field, err in form.errors.items():
+      message.append(field + ' ' + "|".join(err))
+    flash('🛑 Errors' + str(message))
+    return render_template('forms/new_show.html', form=form)
   try:
     new_show = Show(artist_id = form.artist_id.data,
     venue_id = form.venue_id.data,
-    start_time = form.start_time.data
+    start_time = form.start_time.data,
+    end_time = scheduling.end_time(form.start_time.data, form.duration.data)
     )
+    # the venue or the artist may already be booked at that time
+    found = scheduling.conflicts(new_show.venue_id, new_show.artist_id, new_show.start_time, new_show.end_time)
+    if found and app.config['SHOW_CONFLICTS'] == 'reject':
+      conflict = scheduling.describe(found)
+      raise ValueError(conflict)
+    new_show.double_booked = bool(found)
     db.session.add(new_show)
+    db.session.flush()
+    counters.record_show(new_show)
+    projection.add_show(new_show)
     db.session.commit()
+    # upcoming counts are shown on /venues as well
+    page_cache.invalidate('shows', 'venues',
+                          f'venue:{new_show.venue_id}', f'artist:{new_show.artist_id}')
+  except IntegrityError:
+    # a concurrent booking got there first (exclusion constraint)
+    error = True
+    conflict = conflict or 'the venue or the artist is already booked at that time'
+    db.session.rollback()
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    if conflict is None:
+      app.logger.exception('%s failed', request.endpoint)
   finally: 
     db.session.close()
-  if error:
+  if conflict:
+    flash('Show could not be listed: ' + conflict)
+  elif error:
     flash('An error occurred. Show could not be listed.')
   if not error: 
-    flash('Show was successfully listed!')
+    flash('Show was successfully listed!' + (' It is double booked.' if found else ''))
   
   return render_template('pages/home.html')
 
+#  Bulk import
+#  ----------------------------------------------------------------
+
+def invalidate_import(kind, summary):
+  if kind != 'shows':
+    page_cache.invalidate(kind)
+    return
+  page_cache.invalidate('shows', 'venues',
+                        *[f'venue:{venue_id}' for venue_id in summary['venue_ids']],
+                        *[f'artist:{artist_id}' for artist_id in summary['artist_ids']])
+
+@app.route('/import/<kind>', methods=['POST'])
+def import_upload(kind):
+  # multipart upload of a CSV or NDJSON file in the 'file' field
+  upload = request.files.get('file')
+  if kind not in bulk_import.IMPORTERS or upload is None:
+    abort(400)
+
+  summary = bulk_import.import_file(kind, upload.stream, upload.filename)
+  invalidate_import(kind, summary)
+  return jsonify(inserted=summary['inserted'], errors=summary['errors'])
+
+#  Batch writes
+#  ----------------------------------------------------------------
+
+def invalidate_batch(kind, summary):
+  # names and counts show up on every listing, so only the detail pages
+  # are picked out
+  page_cache.invalidate(kind, 'shows', 'venues',
+                        *[f'venue:{venue_id}' for venue_id in summary['venue_ids']],
+                        *[f'artist:{artist_id}' for artist_id in summary['artist_ids']])
+
+@app.route('/batch/<kind>', methods=['POST'])
+def batch_write(kind):
+  # JSON {"create": [{...}], "update": [{"id": 1, ...}]}, all or nothing
+  payload = request.get_json(silent=True)
+  if kind not in bulk_import.IMPORTERS or not isinstance(payload, dict):
+    abort(400)
+  try:
+    summary = batch.apply(kind, payload)
+  except ValueError as e:
+    return jsonify(error=str(e)), 400
+
+  items = summary['create'] + summary['update']
+  if summary['committed']:
+    invalidate_batch(kind, summary)
+    status = 200
+  elif any(item['status'] == 'failed' for item in items):
+    status = 409
+  else:
+    status = 422
+  return jsonify(committed=summary['committed'], create=summary['create'], update=summary['update']), status
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(bulk_import.IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=bulk_import.DEFAULT_BATCH_SIZE, show_default=True)
+def import_data(kind, path, batch_size):
+  """Import venues, artists or shows from a CSV or NDJSON file."""
+  with open(path, encoding='utf-8', newline='') as f:
+    summary = bulk_import.import_file(kind, f, path, batch_size)
+  invalidate_import(kind, summary)
+
+  for error in summary['errors']:
+    click.echo(f"line {error['line']}: {error['errors']}", err=True)
+  click.echo(f"{summary['inserted']} {kind} imported, {len(summary['errors'])} rows rejected")
+
+@app.cli.command('export-data')
+@click.argument('kinds', nargs=-1, type=click.Choice(sorted(bulk_export.EXPORTS)))
+@click.option('--out', 'directory', default='exports', show_default=True, type=click.Path(file_okay=False))
+@click.option('--format', 'format', default='csv', show_default=True, type=click.Choice(bulk_export.FORMATS))
+@click.option('--incremental', is_flag=True, help='Only rows changed since the last incremental export.')
+@click.option('--since', type=click.DateTime(), help='Only rows changed after this time.')
+def export_data(kinds, directory, format, incremental, since):
+  """Stream venues, artists and/or shows into gzip files."""
+  for kind in kinds or sorted(bulk_export.EXPORTS):
+    path, written = bulk_export.export_table(kind, directory, format, since=since, incremental=incremental)
+    click.echo(f'{written} {kind} written to {path}')
+
+@app.cli.command('rollover-show-counts')
+def rollover_show_counts():
+  """Move shows that have started from upcoming to past counters."""
+  counters.rollover()
+  page_cache.invalidate('venues')
+
+@app.cli.command('recount-show-counts')
+def recount_show_counts():
+  """Rebuild every venue and artist show counter from the show table."""
+  counters.recount()
+  page_cache.invalidate('venues')
+
+@app.cli.command('refresh-upcoming-shows')
+@click.option('--full', is_flag=True, help='Rebuild the whole projection.')
+def refresh_upcoming_shows(full):
+  """Bring the upcoming shows projection behind /shows up to date."""
+  if full:
+    projection.rebuild()
+  else:
+    projection.refresh()
+  page_cache.invalidate('shows')
+
+@app.cli.command('compute-matches')
+@click.option('--top', 'k', type=int, help='Matches kept per artist and venue [default: MATCHES_PER_ENTITY].')
+def compute_matches(k):
+  """Precompute the recommended venues and artists on the detail pages."""
+  written = matchmaking.compute(k or app.config['MATCHES_PER_ENTITY'], app.config['MATCH_MEMORY_BUDGET'])
+  click.echo(f'{written} matches written')
+
+@app.cli.command('scan-show-conflicts')
+@click.option('--flag', 'mark', is_flag=True, help='Set double_booked on exactly the overlapping shows.')
+@click.option('--limit', default=20, show_default=True, help='Overlaps listed per venue/artist kind.')
+def scan_show_conflicts(mark, limit):
+  """Find shows overlapping at the same venue or of the same artist."""
+  overlapping = set()
+  for resource in scheduling.RESOURCES:
+    pairs = 0
+    for resource_id, show_id, other_id in scheduling.scan(resource):
+      pairs += 1
+      overlapping.update((show_id, other_id))
+      if pairs <= limit:
+        click.echo(f'{resource} {resource_id}: shows {show_id} and {other_id} overlap')
+    click.echo(f'{pairs} overlapping pairs of shows by {resource}')
+  if mark:
+    scheduling.flag(overlapping)
+    click.echo(f'{len(overlapping)} shows flagged as double booked')
+  elif overlapping:
+    sys.exit(1)
+
+@app.cli.command('purge')
+@click.argument('kind', type=click.Choice(sorted(purge.KINDS)))
+@click.argument('entity_id', type=int)
+@click.option('--batch-size', default=lambda: app.config['PURGE_BATCH_SIZE'], type=int,
+              help='Shows deleted per transaction [default: PURGE_BATCH_SIZE].')
+def purge_entity(kind, entity_id, batch_size):
+  """Delete a venue or artist and its shows, batch by batch."""
+  model = purge.KINDS[kind]
+  if purge.show_count(model, entity_id) is None:
+    raise click.ClickException(f'no {kind} with id {entity_id}')
+  counterpart = 'artist' if model is Venue else 'venue'
+  pages = [f'{counterpart}:{id}' for id in show_counterpart_ids(model, entity_id)]
+  purged = purge.purge(model, entity_id, batch_size,
+                       on_batch=lambda purged: click.echo(f'\r{purged} shows deleted', nl=False, err=True))
+  page_cache.invalidate(f'{kind}s', 'venues', 'shows', f'{kind}:{entity_id}', *pages)
+  click.echo(f'\n{kind} {entity_id} deleted with {purged} shows', err=True)
+
+@app.cli.command('explain-views')
+def explain_views():
+  """Fail if a read view's queries sequentially scan the show tables."""
+  failures = explain.explain_views(app, page_cache)
+  for (method, url), statements in failures.items():
+    for statement, tables in statements:
+      click.echo(f'{method} {url}: seq scan on {", ".join(tables)}')
+      click.echo(f'  {statement}')
+  if failures:
+    sys.exit(1)
+  click.echo('No sequential scans on ' + ', '.join(explain.WATCHED_TABLES))
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -528,6 +757,8 @@ if not app.debug:
 # Launch.
 #----------------------------------------------------------------------------#
 
+# Development server. In production serve wsgi.py with gunicorn instead:
+#   gunicorn -c gunicorn.conf.py wsgi:app
 # Default port:
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,183 @@
+from flask import current_app, render_template, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.test import EnvironBuilder
+
+from app import app as flask_app, page_cache
+from models import Venue, Artist
+from queries import request_now, venue_areas, venue_listing, VENUE_LISTING_ORDER
+import projection
+from pagination import keyset_select, page_args
+from search import search_query, count_query, search_window
+from filters import filter_args, apply_filters
+
+#----------------------------------------------------------------------------#
+# Async read path.
+#----------------------------------------------------------------------------#
+
+# An ASGI app serving the listing and search pages from an async engine
+# (asyncpg, or aiosqlite for a SQLite database), so a worker keeps serving
+# while its requests wait on Postgres instead of parking a thread on each.
+# Queries, templates, config, page cache and request hooks are the Flask
+# app's: every request runs inside a Flask request context, the statements
+# come from the same builders as the sync views and only their execution is
+# awaited. Any other path is left to the sync app, e.g. by routing just these
+# paths to it at the proxy:
+#
+#   uvicorn async_app:app --workers 4 --port 5001
+
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite',
+}
+
+def async_url(uri):
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+
+engine = create_async_engine(async_url(flask_app.config['SQLALCHEMY_DATABASE_URI']),
+                             **flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+Session = sessionmaker(engine, class_=AsyncSession)
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+# mirror the sync views of the same name in app.py
+
+async def keyset_page(session, query, columns):
+    statement, page = keyset_select(query, columns, **page_args())
+    return page((await session.execute(statement)).all())
+
+async def search(session, model, term, page=1, filters=None):
+    per_page = current_app.config['SEARCH_PAGE_SIZE']
+    cap = current_app.config['SEARCH_RESULT_CAP']
+
+    query = search_query(model, term.strip(), engine.dialect.name, filters, cap)
+    count = (await session.execute(count_query(query, model, cap))).scalar()
+    window = search_window(count, page, per_page, cap)
+    rows = (await session.execute(query.offset(window["offset"]).limit(window["limit"]))).all()
+
+    return {
+        "count": count,
+        "data": [
+            {"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows}
+            for row in rows
+        ],
+        "page": window["page"],
+        "pages": window["pages"],
+        "capped": count >= cap
+    }
+
+@page_cache.cached_async('venues')
+async def venues(session):
+    filters = filter_args()
+    page = await keyset_page(session, apply_filters(venue_listing(), Venue, filters), VENUE_LISTING_ORDER)
+    data = venue_areas(page["items"])
+    return render_template('pages/venues.html', areas=data, page=page, filters=filters)
+
+async def search_venues(session):
+    search_term = request.form.get('search_term', '')
+    filters = filter_args()
+    response = await search(session, Venue, search_term, request.form.get('page', 1, type=int), filters)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term, filters=filters)
+
+async def search_artists(session):
+    search_term = request.form.get('search_term', '')
+    filters = filter_args()
+    response = await search(session, Artist, search_term, request.form.get('page', 1, type=int), filters)
+    return render_template('pages/search_artists.html', results=response, search_term=search_term, filters=filters)
+
+@page_cache.cached_async('shows')
+async def shows(session):
+    start, end = projection.date_range_args()
+    page = await keyset_page(session, projection.upcoming_listing(start, end, request_now()),
+                             projection.UPCOMING_LISTING_ORDER)
+    data = [
+        {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time
+        }
+        for show in page["items"]
+    ]
+    return render_template('pages/shows.html', shows=data, page=page)
+
+# (method, Flask endpoint) -> view; URLs are matched by the Flask url_map
+VIEWS = {
+    ('GET', 'venues'): venues,
+    ('POST', 'search_venues'): search_venues,
+    ('POST', 'search_artists'): search_artists,
+    ('GET', 'shows'): shows,
+}
+
+#----------------------------------------------------------------------------#
+# ASGI.
+#----------------------------------------------------------------------------#
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+def wsgi_environ(scope, body):
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']]
+    host = dict(headers).get('host', 'localhost')
+    return EnvironBuilder(
+        path=scope['path'],
+        base_url=f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}",
+        method=scope['method'],
+        query_string=scope['query_string'].decode('latin-1'),
+        headers=headers,
+        data=body
+    ).get_environ()
+
+async def respond():
+    # the Flask request hooks run around the view as they would in app.py:
+    # instrumentation timing, session saving and so on
+    response = flask_app.preprocess_request()
+    if response is None:
+        view = VIEWS.get((request.method, request.endpoint))
+        if view is None:
+            response = (render_template('errors/404.html'), 404)
+        else:
+            try:
+                async with Session() as session:
+                    response = await view(session)
+            except Exception:
+                flask_app.logger.exception('%s failed', request.endpoint)
+                response = (render_template('errors/500.html'), 500)
+    return flask_app.process_response(flask_app.make_response(response))
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    environ = wsgi_environ(scope, await read_body(receive))
+    # contexts live in context variables, so each request task sees its own
+    # even while others are suspended on the database
+    with flask_app.request_context(environ):
+        response = await respond()
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in response.headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': response.get_data()})
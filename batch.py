@@ -0,0 +1,210 @@
+from datetime import datetime
+from itertools import groupby
+
+from flask import current_app
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import SQLAlchemyError
+
+import bulk_import
+import projection
+import scheduling
+from models import db, Venue, Artist, Show
+from queries import SHOW_COUNTERPARTS, SHOW_FOREIGN_KEYS
+
+#----------------------------------------------------------------------------#
+# Batch writes.
+#----------------------------------------------------------------------------#
+
+# Many venues, artists or shows created or edited in one request, all or
+# nothing. Every item is validated first, with the same forms as the create
+# pages and bulk_import.py; if any of them fails, nothing is written and the
+# per-item results say which failed and why. Otherwise creates are inserted
+# in one flush and edits applied as column-only UPDATEs, one executemany
+# per set of edited columns, without loading the rows or their shows. The
+# counters, the upcoming shows projection and the show conflict checks are
+# kept up as the single-row views keep them, and everything commits in one
+# transaction.
+
+# form field -> column, where they differ
+FIELD_COLUMNS = {
+    'website_link': 'website',
+}
+
+# edited columns that appear on the other side's show tiles
+DENORMALIZED_COLUMNS = {'name', 'image_link'}
+
+def column_for(field):
+    return FIELD_COLUMNS.get(field, field)
+
+def result(index, status, id=None, errors=None):
+    item = {'index': index, 'status': status}
+    if id is not None:
+        item['id'] = id
+    if errors:
+        item['errors'] = errors
+    return item
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+def check_create(kind, index, fields):
+    values, error = bulk_import.validate(kind, index, fields)
+    return values, error and error['errors']
+
+def check_update(kind, fields):
+    '''
+    Validate a partial edit: only the fields it sends are checked and
+    written. Returns (id, column values, errors).
+    '''
+    model, form_class, values = bulk_import.IMPORTERS[kind]
+    if not isinstance(fields, dict):
+        return None, None, {'item': ['not a JSON object']}
+    entity_id = fields.get('id')
+    if not isinstance(entity_id, int) or isinstance(entity_id, bool):
+        return None, None, {'id': ['must be an integer id']}
+
+    form = form_class(formdata=bulk_import.form_data(fields), meta={'csrf': False})
+    form.validate()
+    edited = set(fields) - {'id'}
+    errors = {field: form.errors[field] for field in edited if field in form.errors}
+    errors.update({field: ['unknown field'] for field in edited if field not in form._fields})
+    if not edited:
+        errors['item'] = ['nothing to update']
+    if errors:
+        return entity_id, None, errors
+
+    columns = {column_for(field) for field in edited}
+    return entity_id, {key: value for key, value in values(form).items() if key in columns}, None
+
+def check_shows(rows, policy):
+    '''
+    Errors for new shows whose venue or artist is unknown, or which overlap
+    a booking or each other, by position. Overlaps are errors when policy
+    is 'reject' and mark the show double_booked otherwise.
+    '''
+    errors = {}
+    _, missing = bulk_import.missing_parents(list(enumerate(rows)))
+    for error in missing:
+        errors[error['line']] = error['errors']
+
+    clashes = scheduling.check_batch(rows, policy)
+    if policy == 'reject':
+        for i, clash in clashes.items():
+            errors.setdefault(i, {'start_time': [clash]})
+    return errors
+
+#----------------------------------------------------------------------------#
+# Writes.
+#----------------------------------------------------------------------------#
+
+def create(kind, rows):
+    model = bulk_import.IMPORTERS[kind][0]
+    objects = [model(**row) for row in rows]
+    db.session.add_all(objects)
+    db.session.flush()
+    if kind == 'shows':
+        bulk_import.count_shows(rows)
+        projection.project(Show.id.in_([show.id for show in objects]), Show.start_time > datetime.now())
+    return [obj.id for obj in objects]
+
+def update(model, edits):
+    '''
+    Apply [(id, {column: value})] as UPDATEs of just those columns, one
+    executemany per distinct set of columns.
+    '''
+    table = model.__table__
+    by_columns = lambda edit: sorted(edit[1])
+    for columns, group in groupby(sorted(edits, key=by_columns), key=by_columns):
+        db.session.execute(
+            table.update()
+                .where(table.c.id == bindparam('entity_id'))
+                .values({column: bindparam(column) for column in columns}),
+            [dict(values, entity_id=entity_id) for entity_id, values in group]
+        )
+    renamed = [entity_id for entity_id, values in edits if DENORMALIZED_COLUMNS & set(values)]
+    if renamed:
+        projection.rename(model, *renamed)
+    return renamed
+
+def counterpart_ids(model, entity_ids):
+    # venues the artists have played at, or artists the venues have hosted
+    counterpart_fk = SHOW_FOREIGN_KEYS[SHOW_COUNTERPARTS[model][1]]
+    return {id for id, in db.session.execute(
+        select(counterpart_fk).where(SHOW_FOREIGN_KEYS[model].in_(entity_ids)).distinct()
+    )}
+
+def apply(kind, payload):
+    '''
+    Create payload["create"] and edit payload["update"] (items with an
+    "id" and the fields to change) in one transaction. Returns
+    {"committed", "create": [results], "update": [results], "venue_ids",
+    "artist_ids"} where the id sets name the venues and artists whose pages
+    changed.
+    '''
+    model = bulk_import.IMPORTERS[kind][0]
+    creates, updates = payload.get('create') or [], payload.get('update') or []
+    if not isinstance(creates, list) or not isinstance(updates, list):
+        raise ValueError('create and update must be lists')
+    if kind == 'shows' and updates:
+        raise ValueError('shows can only be created')
+    if len(creates) + len(updates) > current_app.config['BATCH_MAX_ITEMS']:
+        raise ValueError(f"at most {current_app.config['BATCH_MAX_ITEMS']} items per batch")
+
+    summary = {'committed': False, 'create': [], 'update': [], 'venue_ids': set(), 'artist_ids': set()}
+
+    rows, create_errors = [], {}
+    for index, fields in enumerate(creates):
+        values, errors = check_create(kind, index, fields)
+        rows.append(values)
+        if errors:
+            create_errors[index] = errors
+    if kind == 'shows':
+        valid = [i for i, row in enumerate(rows) if row is not None]
+        shows_errors = check_shows([rows[i] for i in valid], current_app.config['SHOW_CONFLICTS'])
+        create_errors.update({valid[i]: errors for i, errors in shows_errors.items()})
+
+    edits, update_errors = [], {}
+    for index, fields in enumerate(updates):
+        entity_id, values, errors = check_update(kind, fields)
+        edits.append((entity_id, values))
+        if errors:
+            update_errors[index] = errors
+    wanted = {entity_id for entity_id, values in edits if values is not None}
+    known = {id for id, in db.session.execute(select(model.id).where(model.id.in_(wanted)))}
+    for index, (entity_id, values) in enumerate(edits):
+        if values is not None and entity_id not in known:
+            update_errors[index] = {'id': [f'no {kind[:-1]} with id {entity_id}']}
+
+    if create_errors or update_errors:
+        summary['create'] = [result(i, 'invalid' if i in create_errors else 'skipped', errors=create_errors.get(i))
+                             for i in range(len(creates))]
+        summary['update'] = [result(i, 'invalid' if i in update_errors else 'skipped', id=edits[i][0],
+                                    errors=update_errors.get(i))
+                             for i in range(len(updates))]
+        return summary
+
+    try:
+        ids = create(kind, rows) if rows else []
+        renamed = update(model, edits) if edits else []
+        if kind == 'shows':
+            summary['venue_ids'].update(row['venue_id'] for row in rows)
+            summary['artist_ids'].update(row['artist_id'] for row in rows)
+        elif renamed:
+            counterpart = 'artist_ids' if model is Venue else 'venue_ids'
+            summary[counterpart].update(counterpart_ids(model, renamed))
+        if kind != 'shows':
+            summary[f'{kind[:-1]}_ids'].update(ids, known)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception('%s batch failed', kind)
+        message = {'database': [str(getattr(e, 'orig', e))]}
+        summary['create'] = [result(i, 'failed', errors=message) for i in range(len(creates))]
+        summary['update'] = [result(i, 'failed', id=edits[i][0], errors=message) for i in range(len(updates))]
+        return summary
+
+    summary['committed'] = True
+    summary['create'] = [result(i, 'created', id=id) for i, id in enumerate(ids)]
+    summary['update'] = [result(i, 'updated', id=entity_id) for i, (entity_id, _) in enumerate(edits)]
+    return summary
@@ -0,0 +1,104 @@
+'''
+Concurrency of the async read path (async_app.py) against the sync views on
+/shows, /venues and the two searches, at increasing numbers of concurrent
+clients.
+
+    python benchmarks/async_read.py [--levels 1,8,32,128] [--requests 2000]
+
+Both run in-process against the configured database with the page cache
+off: the sync views through the test client from N threads, the ASGI app
+from N tasks on one event loop. Run it against Postgres; on SQLite the
+async driver only moves the waiting onto its own threads. For numbers that
+include the servers, drive gunicorn and uvicorn with benchmarks/load.py
+--url ... --routes shows,venues,search_venues,search_artists.
+'''
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load import InProcessClient, QUERIES, run, sample_ids, scenarios, summarize
+
+ROUTES = ('shows', 'venues', 'search_venues', 'search_artists')
+
+async def asgi_request(app, method, path, data):
+    path, _, query_string = path.partition('?')
+    headers = [(b'host', b'localhost')]
+    body = b''
+    if data is not None:
+        headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+        body = urlencode(data, doseq=True).encode()
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'scheme': 'http', 'root_path': '',
+        'query_string': query_string.encode(), 'headers': headers
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {}
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['timing'] = dict(message['headers']).get(b'server-timing', b'').decode()
+
+    await app(scope, receive, send)
+    return response['status'], response['timing']
+
+async def run_async(app, routes, ids, concurrency, requests, seed=1):
+    # same round-robin as load.run, with tasks instead of threads
+    samples = {name: [] for name in routes}
+    names = sorted(routes)
+    issued = 0
+
+    async def worker(worker_id):
+        nonlocal issued
+        rng = random.Random(seed * 1000 + worker_id)
+        while issued < requests:
+            name = names[issued % len(names)]
+            issued += 1
+            method, path, data = routes[name](rng, ids)
+            t = time.perf_counter()
+            status, timing = await asgi_request(app, method, path, data)
+            match = QUERIES.search(timing)
+            samples[name].append((time.perf_counter() - t, status, int(match.group(1)) if match else None))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return samples, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--levels', default='1,8,32,128', help='comma separated client counts')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per level and mode')
+    args = parser.parse_args()
+
+    import app as fyyur
+    import async_app
+    fyyur.page_cache.backend = None
+    fyyur.app.config['SLOW_REQUEST_THRESHOLD'] = None
+    with fyyur.app.app_context():
+        ids = sample_ids()
+    routes = {name: route for name, route in scenarios().items() if name in ROUTES}
+
+    print(f'{"clients":>7} {"mode":<6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    for level in [int(level) for level in args.levels.split(',')]:
+        results = {
+            'sync': run(lambda: InProcessClient(fyyur.app), routes, ids, level, requests=args.requests),
+            'async': asyncio.run(run_async(async_app.app, routes, ids, level, args.requests)),
+        }
+        for mode, (samples, elapsed) in results.items():
+            overall = summarize(samples, elapsed)['overall']
+            print(f'{level:>7} {mode:<6} {overall["rps"]:>8.1f} {overall["p50_ms"]:>8.1f} '
+                  f'{overall["p95_ms"]:>8.1f} {overall["p99_ms"]:>8.1f} {overall["errors"]:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+'''
+Latency of the discovery filters on the venue and artist listings and
+searches, from broad to highly selective, with the plan each one gets.
+
+    python benchmarks/seed.py --reset --venues 1000000 --artists 1000000 --shows 0
+    python benchmarks/filters.py [--runs 20]
+
+Each case runs the first keyset page (or first search page) the views would
+run, --runs times, and reports p50/p95 and the number of matches (counted
+up to SEARCH_RESULT_CAP), with the scans in its plan, so a selective filter
+falling back to a sequential scan shows up here. Needs Postgres, which the
+array genres column does anyway.
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load import percentile
+
+def cases(genres, cities):
+    # (label, model name, search term, filters); the seed weights genres
+    # and cities, so the head of each list is broad and the tail selective
+    popular, rare = genres[0], genres[-1]
+    big_city, big_state = cities[0][:2]
+    small_city, small_state = cities[-1][:2]
+    none = {'genres': [], 'state': None, 'city': None, 'seeking': False}
+    return [
+        ('no filter', 'Venue', None, none),
+        ('popular genre', 'Venue', None, dict(none, genres=[popular])),
+        ('rare genre', 'Venue', None, dict(none, genres=[rare])),
+        ('two genres', 'Venue', None, dict(none, genres=[popular, rare])),
+        ('big state', 'Venue', None, dict(none, state=big_state)),
+        ('small city', 'Venue', None, dict(none, state=small_state, city=small_city)),
+        ('rare genre + city + seeking', 'Venue', None,
+         dict(none, genres=[rare], state=big_state, city=big_city, seeking=True)),
+        ('artists: rare genre + state', 'Artist', None, dict(none, genres=[rare], state=small_state)),
+        ('artists: seeking + city', 'Artist', None,
+         dict(none, state=big_state, city=big_city, seeking=True)),
+        ('search + rare genre', 'Venue', 'blue', dict(none, genres=[rare])),
+        ('search + small city', 'Artist', 'wolves', dict(none, state=small_state, city=small_city)),
+    ]
+
+def plan_scans(session, statement):
+    compiled = statement.compile(session.bind)
+    cursor = session.connection().connection.cursor()
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params)
+    scans, nodes = [], [cursor.fetchone()[0][0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Scan' in node['Node Type']:
+            scans.append(f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name')}")
+        nodes.extend(node.get('Plans', []))
+    return ', '.join(sorted(set(scans)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import app
+    from benchmarks.seed import CITIES
+    from filters import apply_filters
+    from models import db, Venue, Artist
+    from pagination import keyset_select
+    from queries import venue_listing, artist_listing, VENUE_LISTING_ORDER, ARTIST_LISTING_ORDER
+    from search import search_query, count_query
+
+    listings = {
+        'Venue': (Venue, venue_listing, VENUE_LISTING_ORDER),
+        'Artist': (Artist, artist_listing, ARTIST_LISTING_ORDER),
+    }
+    cities = sorted(CITIES, key=lambda city: -city[2])
+
+    with app.test_request_context():
+        dialect = db.engine.dialect.name
+        if dialect != 'postgresql':
+            sys.exit('filters.py needs a Postgres database')
+        cap = app.config['SEARCH_RESULT_CAP']
+        # seed.py shuffles genres before weighting them, so rank them by use
+        genres = [genre for genre, in db.session.execute(db.text(
+            'SELECT genre FROM venues, unnest(genres) AS genre GROUP BY genre ORDER BY count(*) DESC'
+        ))]
+        if not genres:
+            sys.exit('no venues to filter, run benchmarks/seed.py first')
+
+        print(f'{"case":<30} {"matches":>8} {"p50 ms":>8} {"p95 ms":>8}  plan')
+        for label, model_name, term, filters in cases(genres, cities):
+            model, listing, order = listings[model_name]
+            if term is None:
+                query = apply_filters(listing(), model, filters)
+                statement, _ = keyset_select(query, order)
+            else:
+                query = search_query(model, term, dialect, filters, cap)
+                statement = query.limit(app.config['SEARCH_PAGE_SIZE'])
+            matches = db.session.execute(count_query(query, model, cap)).scalar()
+
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                db.session.execute(statement).all()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+
+            plan = plan_scans(db.session, statement)
+            shown = f'{matches}+' if matches >= cap else str(matches)
+            print(f'{label:<30} {shown:>8} {percentile(timings, 50) * 1000:>8.2f} '
+                  f'{percentile(timings, 95) * 1000:>8.2f}  {plan}')
+
+
+if __name__ == '__main__':
+    main()
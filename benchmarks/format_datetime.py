@@ -0,0 +1,44 @@
+'''
+Per-call cost of the `datetime` Jinja filter, before and after memoizing
+the compiled Babel pattern and locale.
+
+    python benchmarks/format_datetime.py [calls]
+'''
+import os
+import sys
+import timeit
+from datetime import datetime
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import format_datetime
+
+
+def format_datetime_before(value, format='medium'):
+    # the filter as it was: string round-trip plus a full Babel call per tile
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(calls=20000):
+    start_time = datetime(2035, 5, 21, 21, 30)
+    assert format_datetime_before(str(start_time), 'full') == format_datetime(start_time, 'full')
+
+    before = timeit.timeit(lambda: format_datetime_before(str(start_time), 'full'), number=calls)
+    after = timeit.timeit(lambda: format_datetime(start_time, 'full'), number=calls)
+
+    print(f'{calls} calls')
+    print(f'before: {before / calls * 1e6:8.2f} us/call')
+    print(f'after:  {after / calls * 1e6:8.2f} us/call')
+    print(f'speedup: {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,308 @@
+'''
+Drive every route with concurrent clients and report p50/p95/p99 latency,
+throughput and queries per request, per route and overall.
+
+    python benchmarks/load.py [--url http://localhost:5000] [--concurrency 8]
+                              [--duration 30 | --requests 5000] [--writes] [--no-cache]
+                              [--routes shows,venues,...]
+                              [--json results.json] [--compare baseline.json] [--tolerance 0.25]
+
+Without --url the app is driven in-process through the test client against
+the configured database; with it, a running server is driven over HTTP.
+Query counts come from the Server-Timing header either way. --writes adds
+the create and edit submissions (in-process only, as the forms need CSRF
+tokens otherwise). --json saves the run, tagged with the current commit,
+and --compare prints the p95 change against a saved run, exiting 1 when any
+route got slower than the tolerance allows.
+'''
+import argparse
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.seed import ADJECTIVES, VENUE_NOUNS, ARTIST_NOUNS, GENRES, venue_row, artist_row
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+#----------------------------------------------------------------------------#
+# Scenarios.
+#----------------------------------------------------------------------------#
+
+# name -> function(rng, ids) returning (method, path, form data)
+
+def sample_ids(count=500):
+    from models import db, Venue, Artist
+    ids = {}
+    for key, model in (('venue', Venue), ('artist', Artist)):
+        ids[key] = [id for id, in db.session.query(model.id).order_by(db.func.random()).limit(count)]
+    return ids
+
+def scenarios(writes=False):
+    reads = {
+        'index': lambda rng, ids: ('GET', '/', None),
+        'venues': lambda rng, ids: ('GET', '/venues', None),
+        'artists': lambda rng, ids: ('GET', '/artists', None),
+        'shows': lambda rng, ids: ('GET', '/shows', None),
+        'show_venue': lambda rng, ids: ('GET', f'/venues/{rng.choice(ids["venue"])}', None),
+        'show_artist': lambda rng, ids: ('GET', f'/artists/{rng.choice(ids["artist"])}', None),
+        'search_venues': lambda rng, ids: ('POST', '/venues/search',
+                                           {'search_term': rng.choice(ADJECTIVES + VENUE_NOUNS)}),
+        'search_artists': lambda rng, ids: ('POST', '/artists/search',
+                                            {'search_term': rng.choice(ADJECTIVES + ARTIST_NOUNS)}),
+        'create_venue_form': lambda rng, ids: ('GET', '/venues/create', None),
+        'create_artist_form': lambda rng, ids: ('GET', '/artists/create', None),
+        'create_shows': lambda rng, ids: ('GET', '/shows/create', None),
+        'edit_venue': lambda rng, ids: ('GET', f'/venues/{rng.choice(ids["venue"])}/edit', None),
+        'edit_artist': lambda rng, ids: ('GET', f'/artists/{rng.choice(ids["artist"])}/edit', None),
+        'api.shows': lambda rng, ids: ('GET', '/api/v1/shows', None),
+        'api.venues': lambda rng, ids: ('GET', '/api/v1/venues', None),
+        'api.artists': lambda rng, ids: ('GET', '/api/v1/artists', None),
+    }
+    if not writes:
+        return reads
+
+    def create_show(rng, ids):
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 365))
+        return ('POST', '/shows/create', {
+            'venue_id': rng.choice(ids['venue']),
+            'artist_id': rng.choice(ids['artist']),
+            'start_time': f'{start_time:%Y-%m-%d %H:%M:%S}'
+        })
+
+    def form_fields(row):
+        # a seed row as the create/edit forms submit it
+        fields = {key: value for key, value in row.items() if value not in (None, False)}
+        fields['website_link'] = fields.pop('website')
+        fields['seeking_description'] = row['seeking_description'] or ''
+        for flag in ('seeking_talent', 'seeking_venue'):
+            if fields.get(flag):
+                fields[flag] = 'y'
+        return fields
+
+    venue_form = lambda rng: form_fields(venue_row(rng, rng.randint(0, 10 ** 9), GENRES))
+    artist_form = lambda rng: form_fields(artist_row(rng, rng.randint(0, 10 ** 9), GENRES))
+
+    return dict(reads, **{
+        'create_venue_submission': lambda rng, ids: ('POST', '/venues/create', venue_form(rng)),
+        'create_artist_submission': lambda rng, ids: ('POST', '/artists/create', artist_form(rng)),
+        'create_show_submission': create_show,
+        'edit_venue_submission': lambda rng, ids: ('POST', f'/venues/{rng.choice(ids["venue"])}/edit',
+                                                   venue_form(rng)),
+        'edit_artist_submission': lambda rng, ids: ('POST', f'/artists/{rng.choice(ids["artist"])}/edit',
+                                                    artist_form(rng)),
+    })
+
+#----------------------------------------------------------------------------#
+# Clients.
+#----------------------------------------------------------------------------#
+
+class InProcessClient:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+class HttpClient:
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, method, path, data):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        req = urllib.request.Request(self.url + path, data=body, method=method)
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Server-Timing', '')
+
+#----------------------------------------------------------------------------#
+# Runs.
+#----------------------------------------------------------------------------#
+
+def percentile(sorted_values, p):
+    # nearest rank
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+def run(make_client, routes, ids, concurrency, duration=None, requests=None, seed=1):
+    '''
+    Hit the routes round-robin from `concurrency` threads until `duration`
+    seconds passed or `requests` were made. Returns ({route: [(latency,
+    status, queries)]}, elapsed seconds).
+    '''
+    samples = {name: [] for name in routes}
+    lock = threading.Lock()
+    issued = 0
+    names = sorted(routes)
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def worker(worker_id):
+        nonlocal issued
+        rng = random.Random(seed * 1000 + worker_id)
+        client = make_client()
+        while True:
+            with lock:
+                if requests is not None and issued >= requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                name = names[issued % len(names)]
+                issued += 1
+            method, path, data = routes[name](rng, ids)
+            t = time.perf_counter()
+            status, timing = client.request(method, path, data)
+            latency = time.perf_counter() - t
+            match = QUERIES.search(timing)
+            with lock:
+                samples[name].append((latency, status, int(match.group(1)) if match else None))
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    return samples, time.perf_counter() - started
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        latencies = sorted(latency for latency, _, _ in rows)
+        queries = [q for _, _, q in rows if q is not None]
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for _, status, _ in rows if status >= 500),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'rps': len(rows) / elapsed if elapsed else 0.0,
+            'queries': sum(queries) / len(queries) if queries else None
+        }
+
+    routes = {name: stats(rows) for name, rows in sorted(samples.items()) if rows}
+    overall = stats([row for rows in samples.values() for row in rows])
+    return {'elapsed': elapsed, 'routes': routes, 'overall': overall}
+
+def report(summary, baseline=None):
+    header = f'{"route":<24} {"reqs":>6} {"err":>4} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8} {"queries":>8}'
+    if baseline:
+        header += f' {"p95 vs base":>12}'
+    print(header)
+    print('-' * len(header))
+
+    def line(name, stats, base=None):
+        queries = f'{stats["queries"]:.1f}' if stats['queries'] is not None else '-'
+        text = (f'{name:<24} {stats["requests"]:>6} {stats["errors"]:>4} {stats["p50_ms"]:>8.1f} '
+                f'{stats["p95_ms"]:>8.1f} {stats["p99_ms"]:>8.1f} {stats["rps"]:>8.1f} {queries:>8}')
+        if base:
+            text += f' {(stats["p95_ms"] / base["p95_ms"] - 1) * 100:>+11.0f}%' if base['p95_ms'] else ''
+        print(text)
+
+    base_routes = baseline['routes'] if baseline else {}
+    for name, stats in summary['routes'].items():
+        line(name, stats, base_routes.get(name))
+    print('-' * len(header))
+    line('overall', summary['overall'], baseline['overall'] if baseline else None)
+    print(f'{summary["overall"]["requests"]} requests in {summary["elapsed"]:.1f}s')
+
+def regressions(summary, baseline, tolerance):
+    slower = []
+    for name, stats in summary['routes'].items():
+        base = baseline['routes'].get(name)
+        if base and base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            slower.append(name)
+    return slower
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--url', help='drive a running server instead of the app in-process')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, help='seconds to run (default 30)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests')
+    parser.add_argument('--writes', action='store_true', help='also create and edit venues, artists and shows')
+    parser.add_argument('--no-cache', action='store_true', help='turn the page cache off (in-process only)')
+    parser.add_argument('--routes', help='comma separated route names to drive, default all')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help='save the results to this file')
+    parser.add_argument('--compare', help='a results file saved earlier with --json')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown against --compare (default 0.25)')
+    args = parser.parse_args()
+    if args.duration is None and args.requests is None:
+        args.duration = 30
+    if args.url and args.writes:
+        parser.error('--writes only works in-process')
+
+    import app as fyyur
+    app = fyyur.app
+    with app.app_context():
+        ids = sample_ids()
+    if not ids['venue'] or not ids['artist']:
+        sys.exit('no venues or artists to drive, run benchmarks/seed.py first')
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['SLOW_REQUEST_THRESHOLD'] = None
+        if args.no_cache:
+            fyyur.page_cache.backend = None
+        make_client = lambda: InProcessClient(app)
+
+    routes = scenarios(args.writes)
+    if args.routes:
+        routes = {name: routes[name] for name in args.routes.split(',')}
+    samples, elapsed = run(make_client, routes, ids, args.concurrency,
+                           args.duration, args.requests, args.seed)
+    summary = summarize(samples, elapsed)
+    summary.update({
+        'commit': current_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'target': args.url or 'in-process',
+        'concurrency': args.concurrency
+    })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f'baseline: {baseline.get("commit")} ({baseline.get("date")})')
+    report(summary, baseline)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    if baseline:
+        slower = regressions(summary, baseline, args.tolerance)
+        if slower:
+            print(f'p95 regressed by more than {args.tolerance:.0%}: {", ".join(slower)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+'''
+Fill the configured database with synthetic venues, artists and shows for
+benchmarking. Cities follow a long-tailed, population-like distribution,
+each entity gets one to three genres weighted towards the popular ones, and
+a few venues and artists book most of the shows. The same --seed always
+produces the same data.
+
+    python benchmarks/seed.py [--venues 50000] [--artists 200000] [--shows 5000000]
+                              [--batch-size 10000] [--seed 1] [--reset]
+
+Rows are inserted with executemany batches, one transaction per batch, and
+the show counters are rebuilt at the end.
+'''
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import counters
+from app import app
+from forms import genres_choices
+from models import db, Venue, Artist, Show, Watermark
+
+# (city, state, relative weight), roughly metro population in millions
+CITIES = [
+    ('New York', 'NY', 19.8), ('Los Angeles', 'CA', 13.2), ('Chicago', 'IL', 9.5),
+    ('Dallas', 'TX', 7.6), ('Houston', 'TX', 7.1), ('Washington', 'DC', 6.3),
+    ('Philadelphia', 'PA', 6.2), ('Miami', 'FL', 6.1), ('Atlanta', 'GA', 6.0),
+    ('Boston', 'MA', 4.9), ('Phoenix', 'AZ', 4.8), ('San Francisco', 'CA', 4.7),
+    ('Detroit', 'MI', 4.4), ('Seattle', 'WA', 4.0), ('Minneapolis', 'MN', 3.7),
+    ('San Diego', 'CA', 3.3), ('Tampa', 'FL', 3.2), ('Denver', 'CO', 2.9),
+    ('Baltimore', 'MD', 2.8), ('St. Louis', 'MO', 2.8), ('Orlando', 'FL', 2.7),
+    ('Charlotte', 'NC', 2.7), ('San Antonio', 'TX', 2.6), ('Portland', 'OR', 2.5),
+    ('Sacramento', 'CA', 2.4), ('Pittsburgh', 'PA', 2.4), ('Austin', 'TX', 2.3),
+    ('Las Vegas', 'NV', 2.3), ('Cincinnati', 'OH', 2.3), ('Kansas City', 'MO', 2.2),
+    ('Columbus', 'OH', 2.1), ('Indianapolis', 'IN', 2.1), ('Cleveland', 'OH', 2.1),
+    ('Nashville', 'TN', 2.0), ('Virginia Beach', 'VA', 1.8), ('Providence', 'RI', 1.7),
+    ('Milwaukee', 'WI', 1.6), ('Jacksonville', 'FL', 1.6), ('Oklahoma City', 'OK', 1.4),
+    ('Raleigh', 'NC', 1.4), ('Memphis', 'TN', 1.3), ('Richmond', 'VA', 1.3),
+    ('New Orleans', 'LA', 1.3), ('Louisville', 'KY', 1.3), ('Salt Lake City', 'UT', 1.2),
+    ('Hartford', 'CT', 1.2), ('Buffalo', 'NY', 1.1), ('Birmingham', 'AL', 1.1),
+    ('Rochester', 'NY', 1.1), ('Tucson', 'AZ', 1.0), ('Honolulu', 'HI', 1.0),
+    ('Tulsa', 'OK', 1.0), ('Omaha', 'NE', 0.9), ('Albuquerque', 'NM', 0.9),
+    ('Boise', 'ID', 0.8), ('Anchorage', 'AK', 0.4), ('Burlington', 'VT', 0.2),
+]
+
+GENRES = [genre for genre, _ in genres_choices]
+# popularity falls off with list position after a shuffle, so the head isn't
+# simply alphabetical
+GENRE_WEIGHTS = [1 / (rank + 1) ** 0.8 for rank in range(len(GENRES))]
+
+# name parts; benchmarks/load.py searches for these words
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Crimson',
+              'Wild', 'Rusty', 'Neon', 'Lucky', 'Hollow', 'Broken', 'Quiet', 'Royal']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Club', 'Theater', 'Garage', 'Cellar',
+               'Ballroom', 'Barn', 'Saloon', 'Warehouse']
+ARTIST_NOUNS = ['Foxes', 'Rivers', 'Echoes', 'Wolves', 'Saints', 'Machines', 'Kings',
+                'Ghosts', 'Sparrows', 'Engines', 'Shadows', 'Harbors']
+
+def pick_genres(rng, genres):
+    return sorted(set(rng.choices(genres, GENRE_WEIGHTS, k=rng.randint(1, 3))))
+
+def skewed(rng, ids):
+    # squaring a uniform draw puts most of the mass on the head of the list,
+    # so a small share of venues and artists gets most of the bookings
+    return ids[int(len(ids) * rng.random() ** 2)]
+
+def phone(rng):
+    return f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}'
+
+def venue_row(rng, i, genres):
+    city, state, _ = rng.choices(CITIES, [weight for _, _, weight in CITIES])[0]
+    name = f'The {rng.choice(ADJECTIVES)} {rng.choice(VENUE_NOUNS)} {i}'
+    seeking = rng.random() < 0.3
+    return {
+        'name': name,
+        'genres': pick_genres(rng, genres),
+        'city': city,
+        'state': state,
+        'address': f'{rng.randint(1, 9999)} {rng.choice(ADJECTIVES)} Street',
+        'phone': phone(rng),
+        'website': f'https://venue{i}.example.com',
+        'image_link': f'https://images.example.com/venues/{i}.jpg',
+        'facebook_link': f'https://www.facebook.com/venue{i}',
+        'seeking_talent': seeking,
+        'seeking_description': 'Looking for local acts' if seeking else None
+    }
+
+def artist_row(rng, i, genres):
+    city, state, _ = rng.choices(CITIES, [weight for _, _, weight in CITIES])[0]
+    name = f'{rng.choice(ADJECTIVES)} {rng.choice(ARTIST_NOUNS)} {i}'
+    seeking = rng.random() < 0.4
+    return {
+        'name': name,
+        'genres': pick_genres(rng, genres),
+        'city': city,
+        'state': state,
+        'phone': phone(rng),
+        'website': f'https://artist{i}.example.com',
+        'image_link': f'https://images.example.com/artists/{i}.jpg',
+        'facebook_link': f'https://www.facebook.com/artist{i}',
+        'seeking_venue': seeking,
+        'seeking_description': 'Touring next season' if seeking else None
+    }
+
+def show_row(rng, venue_ids, artist_ids, now):
+    # two years of history and one year of bookings, evening start times
+    day = now.date() + timedelta(days=rng.randint(-730, 365))
+    start_time = datetime(day.year, day.month, day.day, rng.randint(18, 23), rng.choice((0, 30)))
+    return {
+        'venue_id': skewed(rng, venue_ids),
+        'artist_id': skewed(rng, artist_ids),
+        'start_time': start_time
+    }
+
+def insert(model, rows, total, batch_size, label):
+    started = time.perf_counter()
+    batch = []
+    for i, row in enumerate(rows, start=1):
+        batch.append(row)
+        if len(batch) >= batch_size or i == total:
+            db.session.execute(model.__table__.insert(), batch)
+            db.session.commit()
+            batch = []
+            print(f'\r{label}: {i}/{total}', end='', file=sys.stderr)
+    print(f'\r{label}: {total} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+def all_ids(model):
+    return [id for id, in db.session.query(model.id).order_by(model.id)]
+
+def reset():
+    db.session.query(Show).delete(synchronize_session=False)
+    db.session.query(Venue).delete(synchronize_session=False)
+    db.session.query(Artist).delete(synchronize_session=False)
+    db.session.query(Watermark).filter(Watermark.name == counters.WATERMARK).delete(synchronize_session=False)
+    db.session.commit()
+
+def seed(venues, artists, shows, batch_size=10000, seed=1, now=None):
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    genres = GENRES[:]
+    rng.shuffle(genres)
+
+    insert(Venue, (venue_row(rng, i, genres) for i in range(venues)), venues, batch_size, 'venues')
+    insert(Artist, (artist_row(rng, i, genres) for i in range(artists)), artists, batch_size, 'artists')
+
+    venue_ids, artist_ids = all_ids(Venue), all_ids(Artist)
+    # shuffled once so the busiest venues aren't just the oldest ids
+    rng.shuffle(venue_ids)
+    rng.shuffle(artist_ids)
+    if shows and venue_ids and artist_ids:
+        insert(Show, (show_row(rng, venue_ids, artist_ids, now) for _ in range(shows)),
+               shows, batch_size, 'shows')
+
+    counters.recount(now)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--venues', type=int, default=50000)
+    parser.add_argument('--artists', type=int, default=200000)
+    parser.add_argument('--shows', type=int, default=5000000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help='delete every venue, artist and show first')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.reset:
+            reset()
+        seed(args.venues, args.artists, args.shows, args.batch_size, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Venue, Artist, Show, Watermark
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+# Tables are streamed through a server-side cursor in fixed-size partitions
+# and written straight into gzip files, so memory is bounded by one
+# partition whatever the table size. Incremental exports only read rows whose
+# updated_at moved past the table's 'export:<kind>' watermark. Deleted rows
+# leave no trace in an incremental export; take a full one to catch them.
+
+EXPORTS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+
+FORMATS = ('csv', 'ndjson', 'columnar')
+
+DEFAULT_PARTITION_SIZE = 5000
+
+# rows are only exported once they are this old, so a transaction that was
+# still in flight when the export started is picked up by the next run
+SETTLE_TIME = timedelta(seconds=60)
+
+# derived data: the search vector, and the show counters, which change
+# without moving updated_at (see counters.py) and so would go stale in an
+# incremental export
+DERIVED_COLUMNS = {'search_vector', 'num_upcoming_shows', 'num_past_shows'}
+
+def export_columns(model):
+    return [column for column in model.__table__.columns if column.key not in DERIVED_COLUMNS]
+
+def plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def write_csv(f, columns, partitions):
+    writer = csv.writer(f)
+    writer.writerow([column.key for column in columns])
+    for rows in partitions:
+        for row in rows:
+            # multi-valued fields use the same ';' separator bulk_import reads
+            writer.writerow([';'.join(value) if isinstance(value, list) else plain(value)
+                             for value in row])
+
+def write_ndjson(f, columns, partitions):
+    keys = [column.key for column in columns]
+    for rows in partitions:
+        for row in rows:
+            f.write(json.dumps(dict(zip(keys, map(plain, row)))) + '\n')
+
+def write_columnar(f, columns, partitions):
+    # one line per partition holding a list of values per column, the same
+    # layout as a Parquet row group, readable without extra dependencies
+    keys = [column.key for column in columns]
+    for rows in partitions:
+        chunk = {key: [plain(value) for value in values] for key, values in zip(keys, zip(*rows))}
+        f.write(json.dumps({'rows': len(rows), 'columns': chunk}) + '\n')
+
+WRITERS = {
+    'csv': (write_csv, 'csv'),
+    'ndjson': (write_ndjson, 'ndjson'),
+    'columnar': (write_columnar, 'columns.ndjson'),
+}
+
+def export_watermark(kind):
+    return Watermark.query.get(f'export:{kind}')
+
+def export_table(kind, directory, format='csv', since=None, incremental=False,
+                 partition_size=DEFAULT_PARTITION_SIZE, now=None):
+    '''
+    Stream one table into `directory` as a gzip file. `since` limits the
+    export to rows updated after it; `incremental` reads it from, and then
+    advances, the table's watermark. Returns (path, rows written).
+    '''
+    if format not in FORMATS:
+        raise ValueError(f'unknown export format: {format}')
+    model = EXPORTS[kind]
+    columns = export_columns(model)
+    until = (now or datetime.now()) - SETTLE_TIME
+
+    if incremental and since is None:
+        mark = export_watermark(kind)
+        since = mark.value if mark else None
+
+    query = select(*columns)
+    if since is not None or incremental:
+        query = query.where(model.updated_at <= until)
+    if since is not None:
+        query = query.where(model.updated_at > since)
+    query = query.order_by(model.updated_at, model.id)
+
+    write, extension = WRITERS[format]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{kind}-{until:%Y%m%dT%H%M%S}.{extension}.gz')
+
+    written = 0
+    def partitions(result):
+        nonlocal written
+        for rows in result.partitions(partition_size):
+            written += len(rows)
+            yield rows
+
+    result = db.session.execute(query.execution_options(stream_results=True))
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        write(f, columns, partitions(result))
+
+    if incremental:
+        mark = export_watermark(kind) or Watermark(name=f'export:{kind}')
+        mark.value = until
+        db.session.add(mark)
+    db.session.commit()
+
+    return path, written
@@ -0,0 +1,242 @@
+import csv
+import io
+import json
+import os
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+import counters
+import projection
+import scheduling
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Rows are streamed from CSV or NDJSON, validated with the same forms as the
+# create pages (no request context needed) and inserted in executemany
+# batches, one transaction per batch. Invalid rows are reported with their
+# line number and skipped; they never abort the rest of the file. Shows are
+# checked for scheduling conflicts a batch at a time, against the existing
+# bookings and within the batch, as if the rows were booked one at a time
+# in file order, so the batch size never changes the outcome. Under
+# SHOW_CONFLICTS = 'reject' an overlapping show is reported like an invalid
+# row, otherwise it is imported with double_booked set.
+
+DEFAULT_BATCH_SIZE = 1000
+
+def venue_values(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'seeking_talent': bool(form.seeking_talent.data),
+        'seeking_description': form.seeking_description.data
+    }
+
+def artist_values(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'seeking_venue': bool(form.seeking_venue.data),
+        'seeking_description': form.seeking_description.data
+    }
+
+def show_values(form):
+    return {
+        'venue_id': int(form.venue_id.data),
+        'artist_id': int(form.artist_id.data),
+        'start_time': form.start_time.data,
+        'end_time': scheduling.end_time(form.start_time.data, form.duration.data)
+    }
+
+# kind -> (model, form, form data -> column values)
+IMPORTERS = {
+    'venues': (Venue, VenueForm, venue_values),
+    'artists': (Artist, ArtistForm, artist_values),
+    'shows': (Show, ShowForm, show_values),
+}
+
+def read_rows(stream, format):
+    '''
+    Yield (line number, field dict) from a text stream, with None for lines
+    that cannot be parsed. In CSV files a multi-valued field such as genres
+    is separated with ';'.
+    '''
+    if format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                fields = None
+            yield line_number, fields
+    elif format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value.split(';') if key == 'genres' else value
+                                    for key, value in row.items()}
+    else:
+        raise ValueError(f'unknown import format: {format}')
+
+def format_for(filename):
+    return 'ndjson' if os.path.splitext(filename)[1] in ('.ndjson', '.jsonl') else 'csv'
+
+def form_data(fields):
+    data = MultiDict()
+    for key, value in fields.items():
+        if isinstance(value, list):
+            data.setlist(key, [str(item) for item in value])
+        elif isinstance(value, bool):
+            # unchecked boxes are simply absent from a submitted form
+            if value:
+                data[key] = 'y'
+        elif value is not None:
+            data[key] = str(value)
+    return data
+
+def validate(kind, line_number, fields):
+    model, form_class, values = IMPORTERS[kind]
+    if not isinstance(fields, dict):
+        return None, {'line': line_number, 'errors': {'row': ['not a JSON object']}}
+    try:
+        form = form_class(formdata=form_data(fields), meta={'csrf': False})
+    except (TypeError, ValueError) as e:
+        return None, {'line': line_number, 'errors': {'row': [str(e)]}}
+
+    errors = {} if form.validate() else form.errors
+    if not errors and kind == 'shows':
+        if not (form.venue_id.data or '').isdigit() or not (form.artist_id.data or '').isdigit():
+            errors = {'venue_id/artist_id': ['must be integer ids']}
+    if errors:
+        return None, {'line': line_number, 'errors': errors}
+    return values(form), None
+
+def missing_parents(batch):
+    # a dangling foreign key would fail the whole executemany, so shows that
+    # point at unknown venues or artists are reported per row instead
+    venue_ids = {row['venue_id'] for _, row in batch}
+    artist_ids = {row['artist_id'] for _, row in batch}
+    known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+
+    kept, errors = [], []
+    for line_number, row in batch:
+        problems = {}
+        if row['venue_id'] not in known_venues:
+            problems['venue_id'] = [f"no venue with id {row['venue_id']}"]
+        if row['artist_id'] not in known_artists:
+            problems['artist_id'] = [f"no artist with id {row['artist_id']}"]
+        if problems:
+            errors.append({'line': line_number, 'errors': problems})
+        else:
+            kept.append((line_number, row))
+    return kept, errors
+
+def count_shows(rows):
+    # fold a batch of new shows into one counter update per venue and artist
+    mark = counters.as_of()
+    deltas = {Venue: {}, Artist: {}}
+    for row in rows:
+        upcoming = row['start_time'] > mark
+        for model, entity_id in ((Venue, row['venue_id']), (Artist, row['artist_id'])):
+            current = deltas[model].get(entity_id, (0, 0))
+            deltas[model][entity_id] = (current[0] + upcoming, current[1] + (not upcoming))
+    for model, model_deltas in deltas.items():
+        counters.adjust(model, model_deltas)
+
+def check_conflicts(batch):
+    # one probe per batch (scheduling.check_batch) rather than per row, and
+    # an overlap left for the exclusion constraints would fail the whole
+    # executemany on Postgres
+    policy = current_app.config['SHOW_CONFLICTS']
+    clashes = scheduling.check_batch([row for _, row in batch], policy)
+    if policy != 'reject':
+        return batch, []
+    kept = [entry for i, entry in enumerate(batch) if i not in clashes]
+    errors = [{'line': line_number, 'errors': {'start_time': [clashes[i]]}}
+              for i, (line_number, _) in enumerate(batch) if i in clashes]
+    return kept, errors
+
+def insert_batch(kind, batch):
+    model = IMPORTERS[kind][0]
+    errors = []
+    if kind == 'shows':
+        batch, errors = missing_parents(batch)
+        batch, conflicts = check_conflicts(batch)
+        errors.extend(conflicts)
+
+    rows = [row for _, row in batch]
+    if rows:
+        try:
+            db.session.execute(model.__table__.insert(), rows)
+            if kind == 'shows':
+                count_shows(rows)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            message = str(getattr(e, 'orig', e))
+            errors.extend({'line': line_number, 'errors': {'database': [message]}}
+                          for line_number, _ in batch)
+            rows = []
+    return rows, errors
+
+def import_rows(kind, stream, format, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Import every row of `stream` into the `kind` table. Returns
+    {"inserted": n, "errors": [{"line", "errors"}], "venue_ids", "artist_ids"}
+    where the id sets name the venues and artists whose shows changed.
+    '''
+    if kind not in IMPORTERS:
+        raise ValueError(f'unknown import kind: {kind}')
+
+    summary = {'inserted': 0, 'errors': [], 'venue_ids': set(), 'artist_ids': set()}
+    valid = []
+
+    def flush():
+        rows, errors = insert_batch(kind, valid)
+        summary['inserted'] += len(rows)
+        summary['errors'].extend(errors)
+        if kind == 'shows':
+            summary['venue_ids'].update(row['venue_id'] for row in rows)
+            summary['artist_ids'].update(row['artist_id'] for row in rows)
+        valid.clear()
+
+    for line_number, fields in read_rows(stream, format):
+        values, error = validate(kind, line_number, fields)
+        if error:
+            summary['errors'].append(error)
+            continue
+        valid.append((line_number, values))
+        if len(valid) >= batch_size:
+            flush()
+    if valid:
+        flush()
+    if kind == 'shows' and summary['inserted']:
+        # executemany returns no ids, so catch the projection up instead
+        projection.refresh()
+
+    summary['errors'].sort(key=lambda error: error['line'])
+    return summary
+
+def import_file(kind, file, filename, batch_size=DEFAULT_BATCH_SIZE):
+    # binary file objects (uploads) are decoded on the fly, never read whole
+    stream = file if isinstance(file, io.TextIOBase) else io.TextIOWrapper(file, encoding='utf-8', newline='')
+    return import_rows(kind, stream, format_for(filename), batch_size)
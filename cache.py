@@ -0,0 +1,252 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from hashlib import sha1
+
+from flask import current_app, request, session
+
+import replicas
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Rendered read pages are cached per URL inside a namespace ('shows',
+# 'venue:3', ...). Each namespace has a generation token stored alongside the
+# pages; invalidating a namespace replaces its token, which orphans every
+# page cached under the old one (the backend ages them out). That way a write
+# can drop, say, every cursor page of /shows without enumerating them.
+#
+# With read replicas, a page read from a replica just after a write may
+# predate it. A user who just wrote (replicas.sticky()) neither reads nor
+# stores cached pages, and a page read from a replica is only stored once
+# its namespace was last invalidated REPLICA_STICKY_SECONDS ago, the lag
+# the replicas are allowed; each generation token records when it started.
+
+class MemoryBackend:
+    '''
+    In-process LRU with a per-entry TTL. Each worker process has its own.
+    '''
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+class FileSystemBackend:
+    '''
+    One file per entry under a local directory, shared by every worker
+    process on the host. Every sweep_interval seconds a write sweeps out
+    the expired files, which includes the pages an invalidation orphaned,
+    and then the least recently written ones beyond max_entries.
+    '''
+    def __init__(self, directory, max_entries=None, sweep_interval=60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.next_sweep = time.time() + sweep_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                expires_at = pickle.load(f)
+                expired = expires_at is not None and expires_at < time.time()
+                value = None if expired else pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expired:
+            self.delete(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        # write then rename, so readers never see a partial file. The expiry
+        # is pickled on its own ahead of the value, so sweep() can read it
+        # without loading the page
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(expires_at, f)
+            pickle.dump(value, f)
+        os.replace(tmp, self.path(key))
+        if time.time() >= self.next_sweep:
+            self.sweep()
+
+    def delete(self, key):
+        self.remove(self.path(key))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        '''
+        Remove expired entries, temporary files left by a crashed write, and
+        the oldest entries beyond max_entries. Generation tokens may go too;
+        a lost token only starts a fresh generation. Returns the number of
+        files removed.
+        '''
+        now = time.time()
+        self.next_sweep = now + self.sweep_interval
+        removed, kept = 0, []
+        for entry in os.scandir(self.directory):
+            try:
+                written = entry.stat().st_mtime
+                if entry.name.startswith('tmp'):
+                    expired = written < now - self.sweep_interval
+                else:
+                    with open(entry.path, 'rb') as f:
+                        expires_at = pickle.load(f)
+                    expired = expires_at is not None and expires_at < now
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            if expired:
+                self.remove(entry.path)
+                removed += 1
+            elif not entry.name.startswith('tmp'):
+                kept.append((written, entry.path))
+
+        if self.max_entries is not None and len(kept) > self.max_entries:
+            kept.sort()
+            for _, path in kept[:len(kept) - self.max_entries]:
+                self.remove(path)
+                removed += 1
+        return removed
+
+class PageCache:
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('PAGE_CACHE_BACKEND')
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('PAGE_CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'filesystem':
+            self.backend = FileSystemBackend(app.config['PAGE_CACHE_DIR'],
+                                             app.config.get('PAGE_CACHE_MAX_ENTRIES'),
+                                             app.config.get('PAGE_CACHE_TTL') or 60)
+        elif backend:
+            raise ValueError(f'unknown PAGE_CACHE_BACKEND: {backend}')
+
+    def new_generation(self, namespace):
+        token = f'{time.time():.3f}-{uuid.uuid4().hex}'
+        self.backend.set(f'generation:{namespace}', token)
+        return token
+
+    def generation(self, namespace):
+        token = self.backend.get(f'generation:{namespace}')
+        if token is None:
+            # a lost token must never bring back pages cached under an old
+            # one, so start a fresh generation rather than a counter at 0
+            token = self.new_generation(namespace)
+        return token
+
+    def invalidate(self, *namespaces):
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            self.new_generation(namespace)
+
+    @contextmanager
+    def disabled(self):
+        # neither read nor store pages inside the block, e.g. while
+        # `flask explain-views` needs every view to run its queries; for
+        # CLI commands, as it switches the cache off for the whole process
+        backend, self.backend = self.backend, None
+        try:
+            yield
+        finally:
+            self.backend = backend
+
+    def page_key(self, namespace, kwargs):
+        # (key, generation), or Nones when the current request must not be
+        # cached: pages carrying a flashed message are personal, and a user
+        # who just wrote must see pages read since
+        if self.backend is None or request.method != 'GET' or '_flashes' in session \
+                or replicas.sticky():
+            return None, None
+        name = namespace.format(**kwargs)
+        generation = self.generation(name)
+        return f'page:{name}:{generation}:{request.full_path}', generation
+
+    def store(self, key, generation, page):
+        if key is None or not isinstance(page, str):
+            return
+        if replicas.read_from_replica():
+            started = float(generation.split('-')[0])
+            if time.time() - started < current_app.config['REPLICA_STICKY_SECONDS']:
+                # the replica may not have the write that invalidated it yet
+                return
+        self.backend.set(key, page, self.ttl)
+
+    def cached(self, namespace):
+        '''
+        Cache a GET view's rendered 200 responses under `namespace`, which is
+        formatted with the view's arguments, e.g. 'venue:{venue_id}'.
+        '''
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key, generation = self.page_key(namespace, kwargs)
+                page = key and self.backend.get(key)
+                if page is None:
+                    page = view(*args, **kwargs)
+                    self.store(key, generation, page)
+                return page
+            return wrapper
+        return decorator
+
+    def cached_async(self, namespace):
+        '''
+        cached() for coroutine views, see async_app.py.
+        '''
+        def decorator(view):
+            @wraps(view)
+            async def wrapper(*args, **kwargs):
+                key, generation = self.page_key(namespace, kwargs)
+                page = key and self.backend.get(key)
+                if page is None:
+                    page = await view(*args, **kwargs)
+                    self.store(key, generation, page)
+                return page
+            return wrapper
+        return decorator
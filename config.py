@@ -1,14 +1,133 @@
 import os
 
-SECRET_KEY = os.urandom(32)
+# Deployment settings come from the environment; the defaults suit a local
+# development database.
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+# every worker must sign sessions (and flashed messages) with the same key,
+# so set SECRET_KEY whenever more than one process serves requests (gunicorn
+# refuses to start several workers without it, see serving.check_secret_key)
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode with DEBUG=1.
+DEBUG = env_bool('DEBUG', False)
+
+def database_url(url):
+    # Heroku still hands out postgres:// URLs, which SQLAlchemy 1.4 rejects
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = database_url(os.environ.get('DATABASE_URL', 'postgresql://claudia@localhost:5432/fyyur'))
+SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Read replicas, a comma separated REPLICA_DATABASE_URLS. Read-only views
+# spread their SELECTs over them, see replicas.py; none means everything
+# reads from the primary.
+SQLALCHEMY_BINDS = {
+    f'replica{i}': database_url(url.strip())
+    for i, url in enumerate(os.environ.get('REPLICA_DATABASE_URLS', '').split(','))
+    if url.strip()
+}
+# after writing, a user reads from the primary for this many seconds
+REPLICA_STICKY_SECONDS = env_int('REPLICA_STICKY_SECONDS', 10)
 
-# IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://claudia@localhost:5432/fyyur' 
-SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Connection pool, per worker process. A process holds at most
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections, which should cover its
+# threads; serving.check_pool_size() holds all workers to DB_MAX_CONNECTIONS.
+DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 5)
+# seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 10)
+# reconnect after this many seconds, ahead of server or proxy idle timeouts
+DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+# test each connection on checkout, so a restarted database costs a
+# reconnect rather than a failed request
+DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+# milliseconds before Postgres cancels a statement of a web request, 0 for
+# no limit; migrations and CLI commands are never limited (serving.py)
+DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 30000)
+# connections this app may use in total across every worker, i.e. the
+# server's max_connections less what other clients and superusers need
+DB_MAX_CONNECTIONS = env_int('DB_MAX_CONNECTIONS', 90)
+
+def engine_options(uri):
+    # pool sizing only applies to the pooled Postgres engine; SQLite keeps
+    # SQLAlchemy's defaults
+    if not uri.startswith('postgresql'):
+        return {}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# Serving (gunicorn.conf.py): worker processes and threads per worker
+WEB_CONCURRENCY = env_int('WEB_CONCURRENCY', os.cpu_count() or 1)
+WEB_THREADS = env_int('WEB_THREADS', 4)
+
+# Requests slower than this many seconds are logged with their SQL and
+# render timings, None disables the log
+SLOW_REQUEST_THRESHOLD = 0.5
+
+# Flag a request that runs the same statement more than NPLUSONE_THRESHOLD
+# times: 'warn' logs it, 'raise' fails the request, None turns it off. Off
+# unless DEBUG; set NPLUSONE_ACTION=warn to watch a production deployment
+NPLUSONE_THRESHOLD = 10
+NPLUSONE_ACTION = os.environ.get('NPLUSONE_ACTION') or ('warn' if DEBUG else None)
+
+# Listings
+PAGE_SIZE = 50
+# upper bound for the ?per_page= override on listing pages
+MAX_PAGE_SIZE = 200
+
+# Venue and artist pages
+DETAIL_UPCOMING_SHOWS_LIMIT = 30
+DETAIL_PAST_SHOWS_LIMIT = 12
+# A new show overlapping another at its venue or of its artist is
+# 'reject'ed, or listed and 'flag'ged as double booked (scheduling.py)
+SHOW_CONFLICTS = 'reject'
+
+# Deleting a venue or artist with more shows than this returns at once and
+# purges the shows in the background, PURGE_BATCH_SIZE per transaction
+# (purge.py); None always deletes within the request
+PURGE_BACKGROUND_THRESHOLD = 5000
+PURGE_BATCH_SIZE = 1000
+
+# most items one /batch/<kind> request may create and update (batch.py)
+BATCH_MAX_ITEMS = 1000
+
+# recommended venues/artists kept per entity by `flask compute-matches`
+# (matchmaking.py) and shown on its page
+MATCHES_PER_ENTITY = 6
+# bytes of NumPy arrays compute-matches may use at once; each block scores
+# as many artists or venues as fit against every candidate
+MATCH_MEMORY_BUDGET = 256 * 2**20
+
+# Page cache for the public read pages: 'memory' (per process LRU),
+# 'filesystem' (shared by every worker on the host) or None to disable
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory') or None
+PAGE_CACHE_TTL = 60
+# entries per process for 'memory', files on the host for 'filesystem'
+PAGE_CACHE_MAX_ENTRIES = 1024
+PAGE_CACHE_DIR = os.path.join(basedir, '.page_cache')
+
+# Search
+SEARCH_PAGE_SIZE = 20
+# never rank or count more than this many matches for a single search
+SEARCH_RESULT_CAP = 200
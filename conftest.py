@@ -0,0 +1,73 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# config.py reads the environment on import: a throwaway SQLite database,
+# no page cache, and debug mode so errors propagate instead of going to
+# error.log
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur.db')
+os.environ['REPLICA_DATABASE_URLS'] = ''
+os.environ['PAGE_CACHE_BACKEND'] = ''
+os.environ['DEBUG'] = '1'
+
+import counters
+import matchmaking
+import projection
+from app import app as fyyur
+from instrumentation import max_queries
+from models import db, Venue, Artist, Show
+
+# one venue and one artist with far more shows than any page shows
+BUSY_SHOWS = 100
+
+@pytest.fixture
+def app():
+    # a request repeating a statement past NPLUSONE_THRESHOLD fails its test
+    fyyur.config['NPLUSONE_ACTION'] = 'raise'
+    with fyyur.app_context():
+        db.create_all()
+        yield fyyur
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def query_budget():
+    # with query_budget(limit, per_statement=None): see max_queries()
+    return max_queries
+
+@pytest.fixture
+def catalog(app):
+    '''
+    A small catalogue: a busy venue and artist (ids 1) sharing BUSY_SHOWS
+    daily shows, half past and half upcoming, plus a few quiet ones with a
+    show each. Counters, the upcoming shows projection and the matches
+    are rebuilt.
+    '''
+    venues = [Venue(name=f'Venue {i}', city='San Francisco', state='CA', genres=['Jazz', 'Folk'],
+                    seeking_talent=True)
+              for i in range(1, 6)]
+    artists = [Artist(name=f'Artist {i}', city='San Francisco', state='CA', genres=['Jazz'],
+                      seeking_venue=True)
+               for i in range(1, 6)]
+    db.session.add_all(venues + artists)
+    db.session.flush()
+
+    today = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+    shows = [Show(venue_id=venues[0].id, artist_id=artists[0].id,
+                  start_time=today + timedelta(days=day))
+             for day in range(-BUSY_SHOWS // 2, BUSY_SHOWS // 2)]
+    shows += [Show(venue_id=venue.id, artist_id=artist.id, start_time=today + timedelta(days=1, hours=1))
+              for venue, artist in zip(venues[1:], artists[1:])]
+    db.session.add_all(shows)
+    db.session.commit()
+
+    counters.recount()
+    projection.rebuild()
+    matchmaking.compute(fyyur.config['MATCHES_PER_ENTITY'])
+    return {'venues': [venue.id for venue in venues], 'artists': [artist.id for artist in artists]}
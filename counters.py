@@ -0,0 +1,133 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, select
+
+from models import db, Venue, Artist, Show, Watermark
+from queries import SHOW_FOREIGN_KEYS
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry num_upcoming_shows / num_past_shows columns so the
+# listing and search pages never touch the show table. A show counts as
+# upcoming while its start_time is after the 'show_counters' watermark, and
+# rollover() moves shows to the past side as the watermark advances. Every
+# write classifies shows against the same watermark, so the counters stay
+# exact between rollovers.
+#
+# The counters are derived from the show table, so maintaining them leaves
+# updated_at alone: it keeps marking edits to the venue or artist itself,
+# which incremental exports and the projection refresh pick up. The API
+# ETags follow the counters through the WATERMARK row instead.
+
+WATERMARK = 'show_counters'
+
+def counters_watermark(exclusive=False):
+    # writers share-lock the watermark row so a rollover cannot slip in
+    # between classifying a show and committing it
+    return Watermark.query.filter_by(name=WATERMARK) \
+        .with_for_update(read=not exclusive) \
+        .one_or_none()
+
+def as_of():
+    mark = counters_watermark()
+    return mark.value if mark else datetime.now()
+
+def adjust(model, deltas):
+    '''
+    Apply {id: (upcoming_delta, past_delta)} to a model's counters with one
+    batched UPDATE.
+    '''
+    if not deltas:
+        return
+    table = model.__table__
+    db.session.execute(
+        table.update()
+            .where(table.c.id == bindparam('entity_id'))
+            .values(
+                num_upcoming_shows=table.c.num_upcoming_shows + bindparam('upcoming'),
+                num_past_shows=table.c.num_past_shows + bindparam('past'),
+                updated_at=table.c.updated_at
+            ),
+        [
+            {'entity_id': entity_id, 'upcoming': upcoming, 'past': past}
+            for entity_id, (upcoming, past) in deltas.items()
+        ]
+    )
+
+def record_show(show):
+    '''
+    Count a new show against its venue and artist. Runs inside the caller's
+    transaction, before the commit.
+    '''
+    upcoming = show.start_time > as_of()
+    delta = (1, 0) if upcoming else (0, 1)
+    adjust(Venue, {int(show.venue_id): delta})
+    adjust(Artist, {int(show.artist_id): delta})
+
+def release_shows(model, entity_id, *criteria, mark=None):
+    '''
+    Uncount the shows that go away with a deleted venue or artist from the
+    other side of each show; the deleted row's own counters go with it. With
+    `criteria`, only the matching shows go and the row stays, so they are
+    uncounted from it too. Pass the as_of() `mark` when already read.
+    '''
+    mark = mark or as_of()
+    fk = SHOW_FOREIGN_KEYS[model]
+    other_model = Artist if model is Venue else Venue
+    other_fk = SHOW_FOREIGN_KEYS[other_model]
+
+    rows = db.session.query(
+        other_fk,
+        func.count(Show.id).filter(Show.start_time > mark),
+        func.count(Show.id).filter(Show.start_time <= mark)
+    ).filter(fk == entity_id, *criteria).group_by(other_fk).all()
+
+    adjust(other_model, {
+        other_id: (-upcoming, -past) for other_id, upcoming, past in rows
+    })
+    if criteria and rows:
+        adjust(model, {entity_id: (-sum(row[1] for row in rows), -sum(row[2] for row in rows))})
+
+def recount(now=None):
+    '''
+    Recompute every counter from the show table and reset the watermark.
+    '''
+    now = now or datetime.now()
+    mark = counters_watermark(exclusive=True)
+    if mark is None:
+        mark = Watermark(name=WATERMARK, value=now)
+        db.session.add(mark)
+
+    for model, fk in SHOW_FOREIGN_KEYS.items():
+        shows = select(func.count(Show.id)).where(fk == model.id)
+        db.session.query(model).update({
+            model.num_upcoming_shows: shows.where(Show.start_time > now).scalar_subquery(),
+            model.num_past_shows: shows.where(Show.start_time <= now).scalar_subquery(),
+            model.updated_at: model.updated_at
+        }, synchronize_session=False)
+
+    mark.value = now
+    db.session.commit()
+
+def rollover(now=None):
+    '''
+    Move shows that started since the last run from upcoming to past.
+    Meant to run periodically, e.g. from cron via `flask rollover-show-counts`.
+    '''
+    now = now or datetime.now()
+    mark = counters_watermark(exclusive=True)
+    if mark is None:
+        db.session.rollback()
+        return recount(now)
+
+    for model, fk in SHOW_FOREIGN_KEYS.items():
+        moved = db.session.query(fk, func.count(Show.id)) \
+            .filter(Show.start_time > mark.value, Show.start_time <= now) \
+            .group_by(fk) \
+            .all()
+        adjust(model, {entity_id: (-count, count) for entity_id, count in moved})
+
+    mark.value = now
+    db.session.commit()
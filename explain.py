@@ -0,0 +1,95 @@
+from sqlalchemy import event
+
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Query plan checks.
+#----------------------------------------------------------------------------#
+
+# Drives every read view through the test client, with the page cache off so
+# each one runs its queries, captures the SELECTs it issues and EXPLAINs
+# each of them against the configured database. A
+# sequential scan on one of the WATCHED_TABLES means an index went missing
+# or a query stopped using it.
+
+WATCHED_TABLES = ('show', 'upcoming_shows')
+
+def view_requests():
+    venue_id = db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar()
+    artist_id = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar()
+    return [
+        ('GET', '/venues', None),
+        ('GET', '/artists', None),
+        ('GET', '/shows', None),
+        ('GET', f'/venues/{venue_id}', None),
+        ('GET', f'/artists/{artist_id}', None),
+        ('POST', '/venues/search', {'search_term': 'the'}),
+        ('POST', '/artists/search', {'search_term': 'the'}),
+    ]
+
+def capture_statements(app, method, url, data=None):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        app.test_client().open(url, method=method, data=data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+def postgres_seq_scans(cursor, statement, parameters):
+    # with seqscan disabled the planner only falls back to one when no
+    # usable index exists, which keeps the check meaningful on small tables
+    cursor.execute('SET LOCAL enable_seqscan = off')
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+    plan = cursor.fetchone()[0][0]['Plan']
+
+    scans = []
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+def sqlite_seq_scans(cursor, statement, parameters):
+    cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+    scans = []
+    for row in cursor.fetchall():
+        detail = row[-1].split()
+        # "SCAN show" is a table scan, "SCAN show USING INDEX ..." is not
+        if detail[0] == 'SCAN' and 'USING' not in detail:
+            scans.append(detail[1])
+    return scans
+
+def explain_views(app, page_cache):
+    '''
+    Return {(method, url): [(statement, tables)]} for every captured
+    statement that sequentially scans a watched table.
+    '''
+    seq_scans = postgres_seq_scans if db.engine.dialect.name == 'postgresql' else sqlite_seq_scans
+    failures = {}
+
+    with page_cache.disabled():
+        captured = [(method, url, capture_statements(app, method, url, data))
+                    for method, url, data in view_requests()]
+
+    for method, url, statements in captured:
+        for statement, parameters in statements:
+            connection = db.engine.raw_connection()
+            try:
+                cursor = connection.cursor()
+                tables = [table for table in seq_scans(cursor, statement, parameters)
+                          if table in WATCHED_TABLES]
+            finally:
+                connection.rollback()
+                connection.close()
+            if tables:
+                failures.setdefault((method, url), []).append((statement, tables))
+    return failures
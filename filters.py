@@ -0,0 +1,72 @@
+from flask import request
+from sqlalchemy import Boolean, and_, exists, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from forms import genres_choices, states_choices
+from models import Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Discovery filters.
+#----------------------------------------------------------------------------#
+
+# ?genre=Jazz&genre=Blues&state=NY&city=New York&seeking=y on the listings,
+# the same fields on the search forms. Every filter is a plain predicate the
+# indexes answer: genres with @> on the GIN index over the array column,
+# state and city with the (state, city, ...) indexes. Unknown genres and
+# states are ignored rather than matching nothing. On SQLite, where genres
+# is a JSON list, the genre filter looks the genres up with json_each().
+
+GENRES = {genre for genre, _ in genres_choices}
+STATES = {state for state, _ in states_choices}
+
+SEEKING_COLUMNS = {
+    Venue: Venue.seeking_talent,
+    Artist: Artist.seeking_venue,
+}
+
+class contains_all(FunctionElement):
+    '''
+    contains_all(column, *values): the genres column holds every one of
+    the values.
+    '''
+    type = Boolean()
+    name = 'contains_all'
+    inherit_cache = True
+
+@compiles(contains_all, 'postgresql')
+def contains_all_array(element, compiler, **kw):
+    column, *values = element.clauses
+    return compiler.process(column.op('@>')(postgresql.array(values)), **kw)
+
+@compiles(contains_all)
+def contains_all_json(element, compiler, **kw):
+    column, *values = element.clauses
+    elements = func.json_each(column).table_valued('value')
+    return compiler.process(and_(*[exists().where(elements.c.value == value) for value in values]), **kw)
+
+def filter_args():
+    # query string on GET listings, form fields on search POSTs
+    values = request.values
+    state = values.get('state')
+    return {
+        "genres": [genre for genre in values.getlist('genre') if genre in GENRES],
+        "state": state if state in STATES else None,
+        "city": (values.get('city') or '').strip() or None,
+        "seeking": values.get('seeking') in ('y', 'on', 'true', '1')
+    }
+
+def apply_filters(query, model, filters):
+    if filters is None:
+        return query
+    if filters['genres']:
+        # every selected genre
+        query = query.where(contains_all(model.genres, *filters['genres']))
+    if filters['state']:
+        query = query.where(model.state == filters['state'])
+    if filters['city']:
+        query = query.where(model.city == filters['city'])
+    if filters['seeking']:
+        query = query.where(SEEKING_COLUMNS[model].is_(True))
+    return query
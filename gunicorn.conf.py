@@ -0,0 +1,27 @@
+import os
+
+import config
+from serving import check_pool_size, check_secret_key
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+
+bind = f'0.0.0.0:{os.environ.get("PORT", "5000")}'
+workers = config.WEB_CONCURRENCY
+threads = config.WEB_THREADS
+worker_class = 'gthread'
+# each worker builds its own engine after the fork; a preloaded app would
+# hand every worker copies of the same pooled connections
+preload_app = False
+timeout = 30
+graceful_timeout = 30
+# recycle workers now and then so slow leaks can't build up
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = '-'
+
+def on_starting(server):
+    settings = {key: getattr(config, key) for key in dir(config) if key.isupper()}
+    warnings = check_pool_size(settings, server.cfg.workers, server.cfg.threads)
+    warnings += check_secret_key(server.cfg.workers)
+    for warning in warnings:
+        server.log.warning(warning)
@@ -0,0 +1,232 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from flask import Response, current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#----------------------------------------------------------------------------#
+
+# For every request we record the endpoint, total latency, template render
+# time, SQL statement count, SQL time and rows fetched. Each response gets a
+# Server-Timing header, slow requests are logged, and per-endpoint totals are
+# served in Prometheus text format at /_metrics. Totals are per process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RepeatedQueryError(Exception):
+    '''
+    The same statement ran more than NPLUSONE_THRESHOLD times in one
+    request, the usual sign of a per-row (N+1) query.
+    '''
+
+def normalize_sql(statement):
+    # statements are already parameterized; fold IN lists of any length,
+    # inline literals and whitespace so per-row variants group together
+    statement = re.sub(r'\bIN\s*\([^()]*\)', 'IN (...)', statement, flags=re.IGNORECASE)
+    statement = re.sub(r"'(?:[^']|'')*'|\b\d+\b", '?', statement)
+    return ' '.join(statement.split())
+
+# query counters opened by count_queries(), fed by every statement executed
+# while they are active, inside a request or not
+active_counters = []
+
+def request_metrics():
+    if has_request_context():
+        return g.get('metrics')
+    return None
+
+class TimedTemplate(Template):
+    # included and extended templates render inside their parent's render()
+    # call, so timing the outer call counts each page exactly once
+    def render(self, *args, **kwargs):
+        metrics = request_metrics()
+        if metrics is None:
+            return super().render(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            metrics['render_time'] += time.perf_counter() - start
+
+def check_repeated(metrics, statement):
+    threshold = current_app.config.get('NPLUSONE_THRESHOLD')
+    action = current_app.config.get('NPLUSONE_ACTION')
+    if not action or threshold is None:
+        return
+
+    normalized = normalize_sql(statement)
+    metrics['statements'][normalized] += 1
+    count = metrics['statements'][normalized]
+    if count <= threshold:
+        return
+
+    message = f'{request.endpoint}: statement ran {count} times in one request: {normalized}'
+    if action == 'raise':
+        raise RepeatedQueryError(message)
+    if count == threshold + 1:
+        # warn once per statement and request
+        current_app.logger.warning('possible N+1 query in %s', message)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for counter in active_counters:
+        counter[normalize_sql(statement)] += 1
+    metrics = request_metrics()
+    if metrics is not None:
+        check_repeated(metrics, statement)
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    metrics = request_metrics()
+    if metrics is None:
+        return
+    metrics['sql_count'] += 1
+    metrics['sql_time'] += elapsed
+    # DBAPI rowcount; exact for SELECTs on psycopg2, -1 where unsupported
+    if cursor.description is not None and cursor.rowcount > 0:
+        metrics['rows'] += cursor.rowcount
+
+class Instrumentation:
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.totals = defaultdict(lambda: defaultdict(float))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule('/_metrics', 'metrics', self.metrics_view)
+
+    def start_request(self):
+        g.metrics = {
+            'start': time.perf_counter(),
+            'render_time': 0.0,
+            'sql_count': 0,
+            'sql_time': 0.0,
+            'rows': 0,
+            'statements': Counter()
+        }
+
+    def finish_request(self, response):
+        metrics = g.pop('metrics', None)
+        if metrics is None or request.endpoint == 'metrics':
+            return response
+        total = time.perf_counter() - metrics['start']
+        endpoint = request.endpoint or 'unmatched'
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={metrics["sql_time"] * 1000:.1f};desc="{metrics["sql_count"]} queries"',
+            f'render;dur={metrics["render_time"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}'
+        ])
+
+        self.record(endpoint, total, metrics)
+
+        threshold = self.app.config.get('SLOW_REQUEST_THRESHOLD')
+        if threshold is not None and total >= threshold:
+            self.app.logger.warning(
+                'slow request: %s %s (%s) %.1fms, %d queries in %.1fms, %d rows, render %.1fms',
+                request.method, request.full_path.rstrip('?'), endpoint, total * 1000,
+                metrics['sql_count'], metrics['sql_time'] * 1000, metrics['rows'],
+                metrics['render_time'] * 1000
+            )
+        return response
+
+    def record(self, endpoint, total, metrics):
+        with self.lock:
+            self.requests[endpoint] += 1
+            buckets = self.buckets[endpoint]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if total <= bound:
+                    buckets[i] += 1
+            totals = self.totals[endpoint]
+            totals['latency'] += total
+            totals['render'] += metrics['render_time']
+            totals['sql_time'] += metrics['sql_time']
+            totals['sql_count'] += metrics['sql_count']
+            totals['rows'] += metrics['rows']
+
+    def metrics_view(self):
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        with self.lock:
+            endpoints = sorted(self.requests)
+            histogram = []
+            for endpoint in endpoints:
+                for bound, count in zip(LATENCY_BUCKETS, self.buckets[endpoint]):
+                    histogram.append(f'fyyur_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                histogram.append(f'fyyur_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {self.requests[endpoint]}')
+                histogram.append(f'fyyur_request_duration_seconds_sum{{endpoint="{endpoint}"}} {self.totals[endpoint]["latency"]}')
+                histogram.append(f'fyyur_request_duration_seconds_count{{endpoint="{endpoint}"}} {self.requests[endpoint]}')
+            metric('fyyur_request_duration_seconds', 'histogram', 'Request latency.', histogram)
+
+            for name, key, help in (
+                ('fyyur_template_render_seconds_total', 'render', 'Time spent rendering templates.'),
+                ('fyyur_sql_seconds_total', 'sql_time', 'Time spent executing SQL.'),
+                ('fyyur_sql_statements_total', 'sql_count', 'SQL statements executed.'),
+                ('fyyur_sql_rows_total', 'rows', 'Rows returned by SELECT statements.'),
+            ):
+                metric(name, 'counter', help, [
+                    f'{name}{{endpoint="{endpoint}"}} {self.totals[endpoint][key]}'
+                    for endpoint in endpoints
+                ])
+
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@contextmanager
+def count_queries():
+    '''
+    Count every statement executed inside the block, grouped by normalized
+    SQL. Yields the Counter.
+    '''
+    counter = Counter()
+    active_counters.append(counter)
+    try:
+        yield counter
+    finally:
+        active_counters.remove(counter)
+
+@contextmanager
+def max_queries(limit, per_statement=None):
+    '''
+    Fail with an AssertionError listing the statements when the block runs
+    more than `limit` statements, or any one statement more than
+    `per_statement` times. Meant to be wrapped in a pytest fixture, e.g.
+
+        @pytest.fixture
+        def query_budget():
+            return max_queries
+
+        def test_shows(client, query_budget):
+            with query_budget(3, per_statement=1):
+                client.get('/shows')
+    '''
+    with count_queries() as counter:
+        yield counter
+
+    total = sum(counter.values())
+    repeated = {sql: n for sql, n in counter.items()
+                if per_statement is not None and n > per_statement}
+    if total > limit or repeated:
+        listing = '\n'.join(f'  {n} x {sql}' for sql, n in counter.most_common())
+        raise AssertionError(f'{total} statements (limit {limit}):\n{listing}')
@@ -0,0 +1,248 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+
+from forms import genres_choices
+from models import db, Venue, Artist, Show, Match, Watermark
+
+#----------------------------------------------------------------------------#
+# Matchmaking.
+#----------------------------------------------------------------------------#
+
+# Recommended venues for each artist and artists for each venue. A pair's
+# score adds up
+#
+#   genres       Jaccard overlap of their genres
+#   city, state  playing in the same city, or at least the same state
+#   seeking      the recommended side is looking (seeking_talent/_venue)
+#   co_bookings  past shows together, with diminishing returns
+#
+# Scoring every pair is far too slow for a page view, so compute() scores
+# them in a batch, block by block with NumPy (blocks sized to a memory
+# budget, MATCH_MEMORY_BUDGET), and keeps only the best
+# MATCHES_PER_ENTITY of each artist and venue in the matches table. The
+# detail pages read that with one index range scan (recommendations()).
+# Run it periodically, e.g. nightly from cron via `flask compute-matches`;
+# cached detail pages pick the new matches up as they expire.
+
+WATERMARK = 'matches'
+
+WEIGHTS = {
+    'genres': 1.0,
+    'city': 0.3,
+    'state': 0.1,
+    'seeking': 0.2,
+    'co_bookings': 0.4,
+}
+
+# bytes a pair takes at the peak of scoring and ranking its block, i.e.
+# score_block()'s float32 temporaries and masks plus top_k()'s negated
+# copy and int64 argpartition indexes; about 30 measured, with headroom
+BYTES_PER_PAIR = 40
+
+GENRES = [genre for genre, _ in genres_choices]
+GENRE_COLUMNS = {genre: column for column, genre in enumerate(GENRES)}
+
+# whose recommendations a matches row holds -> the model recommended
+RECOMMENDED = {
+    'artist': Venue,
+    'venue': Artist,
+}
+
+#----------------------------------------------------------------------------#
+# Scoring.
+#----------------------------------------------------------------------------#
+
+def genre_matrix(rows):
+    # one row per entity, one column per genres_choices entry; genres that
+    # aren't in the list (old free-text data) can't match anything anyway
+    matrix = np.zeros((len(rows), len(GENRES)), dtype=np.float32)
+    for i, genres in enumerate(rows):
+        for genre in genres or ():
+            column = GENRE_COLUMNS.get(genre)
+            if column is not None:
+                matrix[i, column] = 1
+    return matrix
+
+def codes(values, vocabulary):
+    # small ints for equality tests; unknown (None) locations never match
+    return np.array([-1 if value is None else vocabulary.setdefault(value, len(vocabulary))
+                     for value in values], dtype=np.int64)
+
+class Side:
+    '''
+    The columns of every venue or artist, as arrays aligned with `ids`.
+    '''
+
+    def __init__(self, model, seeking, places, states):
+        rows = db.session.execute(
+            select(model.id, model.genres, model.city, model.state, seeking).order_by(model.id)
+        ).all()
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.genres = genre_matrix([row[1] for row in rows])
+        self.genre_counts = self.genres.sum(axis=1)
+        self.place = codes([(row[3], row[2]) if row[2] and row[3] else None for row in rows], places)
+        self.state = codes([row[3] or None for row in rows], states)
+        self.seeking = np.array([bool(row[4]) for row in rows], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+def co_bookings(now):
+    # {(artist_id, venue_id): past shows together}
+    rows = db.session.execute(
+        select(Show.artist_id, Show.venue_id, func.count())
+            .where(Show.start_time <= now)
+            .group_by(Show.artist_id, Show.venue_id)
+    )
+    return {(artist_id, venue_id): count for artist_id, venue_id, count in rows}
+
+def booking_matrix(bookings, subjects, candidates, subject_first):
+    # the co-booking boost as (subject index, candidate index, boost) arrays
+    subject_index = {id: i for i, id in enumerate(subjects.ids.tolist())}
+    candidate_index = {id: i for i, id in enumerate(candidates.ids.tolist())}
+    rows, cols, boosts = [], [], []
+    for pair, count in bookings.items():
+        subject_id, candidate_id = pair if subject_first else reversed(pair)
+        if subject_id in subject_index and candidate_id in candidate_index:
+            rows.append(subject_index[subject_id])
+            cols.append(candidate_index[candidate_id])
+            # 1 show is worth half the weight, 3 shows three quarters, ...
+            boosts.append(1 - 1 / (1 + count))
+    return (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64),
+            np.array(boosts, dtype=np.float32))
+
+def score_block(subjects, candidates, block, bookings):
+    '''
+    Scores of subjects[block] against every candidate, as a
+    (len(block), len(candidates)) array.
+    '''
+    genres = subjects.genres[block]
+    overlap = genres @ candidates.genres.T
+    union = subjects.genre_counts[block, None] + candidates.genre_counts[None, :] - overlap
+    scores = WEIGHTS['genres'] * np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+    place = subjects.place[block, None]
+    state = subjects.state[block, None]
+    same_place = (place == candidates.place[None, :]) & (place >= 0)
+    same_state = (state == candidates.state[None, :]) & (state >= 0)
+    scores += WEIGHTS['city'] * same_place + WEIGHTS['state'] * same_state
+    scores += WEIGHTS['seeking'] * candidates.seeking[None, :]
+
+    rows, cols, boosts = bookings
+    in_block = (rows >= block.start) & (rows < block.stop)
+    booked = np.zeros_like(scores)
+    np.add.at(booked, (rows[in_block] - block.start, cols[in_block]), boosts[in_block])
+    scores += WEIGHTS['co_bookings'] * booked
+
+    # a candidate that's merely nearby or looking isn't a match on its own
+    scores[(overlap == 0) & (booked == 0)] = 0
+    return scores
+
+def top_k(scores, k):
+    # the k best columns of every row, best first, ties to the lower index
+    k = min(k, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    picked = np.take_along_axis(scores, best, axis=1)
+    order = np.lexsort((best, -picked), axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    return best, np.take_along_axis(picked, order, axis=1)
+
+def block_size_for(candidates, memory_budget):
+    # subjects per block, so a block's pairs stay within memory_budget bytes
+    # however many candidates there are; at least one subject at a time
+    return max(1, memory_budget // (max(candidates, 1) * BYTES_PER_PAIR))
+
+def rank(kind, subjects, candidates, bookings, k, memory_budget):
+    '''
+    Yield the matches rows of `kind`, scoring as many subjects at a time as
+    fit in memory_budget bytes against every candidate.
+    '''
+    if not len(candidates):
+        return
+    block_size = block_size_for(len(candidates), memory_budget)
+    for start in range(0, len(subjects), block_size):
+        block = slice(start, min(start + block_size, len(subjects)))
+        best, scores = top_k(score_block(subjects, candidates, block, bookings), k)
+        for offset in range(best.shape[0]):
+            entity_id = int(subjects.ids[start + offset])
+            position = 0
+            for column, score in zip(best[offset].tolist(), scores[offset].tolist()):
+                if score <= 0:
+                    break
+                position += 1
+                yield {
+                    'kind': kind,
+                    'entity_id': entity_id,
+                    'rank': position,
+                    'match_id': int(candidates.ids[column]),
+                    'score': round(score, 4),
+                }
+
+#----------------------------------------------------------------------------#
+# Batch job.
+#----------------------------------------------------------------------------#
+
+def compute(k, memory_budget=256 * 2**20, batch_size=10000, now=None):
+    '''
+    Replace every precomputed match in one transaction, so the detail pages
+    keep showing the previous matches until the new ones are committed.
+    Returns the number of rows written.
+    '''
+    now = now or datetime.now()
+    places, states = {}, {}
+    venues = Side(Venue, Venue.seeking_talent, places, states)
+    artists = Side(Artist, Artist.seeking_venue, places, states)
+    bookings = co_bookings(now)
+
+    db.session.query(Match).delete(synchronize_session=False)
+    written, batch = 0, []
+    for kind, subjects, candidates in (('artist', artists, venues), ('venue', venues, artists)):
+        pairs = booking_matrix(bookings, subjects, candidates, subject_first=kind == 'artist')
+        for row in rank(kind, subjects, candidates, pairs, k, memory_budget):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                db.session.execute(Match.__table__.insert(), batch)
+                written += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(Match.__table__.insert(), batch)
+        written += len(batch)
+
+    mark = Watermark.query.filter_by(name=WATERMARK).with_for_update().one_or_none()
+    if mark is None:
+        db.session.add(Watermark(name=WATERMARK, value=now))
+    else:
+        mark.value = now
+    db.session.commit()
+    return written
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+def recommendations(kind, entity_id, limit):
+    '''
+    The precomputed matches of an artist ('artist') or a venue ('venue'),
+    best first, with what the panel tiles show of each.
+    '''
+    model = RECOMMENDED[kind]
+    rows = db.session.execute(
+        select(model.id, model.name, model.city, model.state, model.image_link, Match.score)
+            .join(model, model.id == Match.match_id)
+            .where(Match.kind == kind, Match.entity_id == entity_id)
+            .order_by(Match.rank)
+            .limit(limit)
+    )
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "city": row.city,
+            "state": row.state,
+            "image_link": row.image_link,
+            "score": row.score
+        }
+        for row in rows
+    ]
@@ -0,0 +1,52 @@
+"""denormalized upcoming/past show counters
+
+Revision ID: 1fe71b5346b5
+Revises: 4bb4f84f7ac7
+Create Date: 2026-10-18 10:03:47.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1fe71b5346b5'
+down_revision = '4bb4f84f7ac7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('watermarks',
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('value', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # venues.num_upcoming_shows already exists from the initial migration
+    op.add_column('venues', sa.Column('num_past_shows', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('num_past_shows', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill against a single "now" that also becomes the first watermark
+    op.execute("INSERT INTO watermarks (name, value) VALUES ('show_counters', now())")
+    for table, fk in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(f"""
+        UPDATE {table} SET
+          num_upcoming_shows = (SELECT count(*) FROM show WHERE show.{fk} = {table}.id
+                                AND show.start_time > (SELECT value FROM watermarks WHERE name = 'show_counters')),
+          num_past_shows = (SELECT count(*) FROM show WHERE show.{fk} = {table}.id
+                            AND show.start_time <= (SELECT value FROM watermarks WHERE name = 'show_counters'))
+        """)
+
+    op.alter_column('venues', 'num_upcoming_shows', existing_type=sa.Integer(),
+                    server_default='0', nullable=False)
+
+
+def downgrade():
+    op.alter_column('venues', 'num_upcoming_shows', existing_type=sa.Integer(),
+                    server_default=None, nullable=True)
+    op.drop_column('artists', 'num_past_shows')
+    op.drop_column('artists', 'num_upcoming_shows')
+    op.drop_column('venues', 'num_past_shows')
+    op.drop_table('watermarks')
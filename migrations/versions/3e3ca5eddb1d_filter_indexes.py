@@ -0,0 +1,30 @@
+"""GIN genres and (state, city) indexes for the discovery filters
+
+Revision ID: 3e3ca5eddb1d
+Revises: e1815182cc1d
+Create Date: 2026-10-18 16:07:42.615230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e3ca5eddb1d'
+down_revision = 'e1815182cc1d'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists')
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index(f'ix_{table}_genres', table, ['genres'], postgresql_using='gin')
+        op.create_index(f'ix_{table}_state_city', table, ['state', 'city', 'name', 'id'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_state_city', table_name=table)
+        op.drop_index(f'ix_{table}_genres', table_name=table)
@@ -0,0 +1,59 @@
+"""search indexes on venues and artists
+
+Revision ID: 4bb4f84f7ac7
+Revises: 55b0c603c2d9
+Create Date: 2026-10-18 09:12:31.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4bb4f84f7ac7'
+down_revision = '55b0c603c2d9'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = ('venues', 'artists')
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # array_to_string is not immutable, so the vector is kept up to date by a
+    # trigger instead of an expression index or a generated column
+    op.execute("""
+    CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+    BEGIN
+      NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.city, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(array_to_string(NEW.genres, ' '), '')), 'C');
+      RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """)
+
+    for table in SEARCH_TABLES:
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(f"""
+        CREATE TRIGGER {table}_search_vector_update
+        BEFORE INSERT OR UPDATE OF name, city, genres ON {table}
+        FOR EACH ROW EXECUTE PROCEDURE search_vector_update()
+        """)
+        # touch every row once so the trigger backfills existing data
+        op.execute(f'UPDATE {table} SET name = name')
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+        op.create_index(f'ix_{table}_name_trgm', table, ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in SEARCH_TABLES:
+        op.drop_index(f'ix_{table}_name_trgm', table_name=table)
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table}')
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION IF EXISTS search_vector_update()')
@@ -0,0 +1,34 @@
+"""covering show indexes for the detail page queries
+
+Revision ID: 56d02d1f0ad0
+Revises: 600dd509f6b3
+Create Date: 2026-10-18 13:35:52.664310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '56d02d1f0ad0'
+down_revision = '600dd509f6b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (fk, start_time, id) matches the ORDER BY of both detail queries, and
+    # the included counterpart id lets them run as index-only scans
+    op.drop_index('ix_show_venue_start_time', table_name='show')
+    op.drop_index('ix_show_artist_start_time', table_name='show')
+    op.create_index('ix_show_venue_start_time', 'show', ['venue_id', 'start_time', 'id'],
+                    postgresql_include=['artist_id'])
+    op.create_index('ix_show_artist_start_time', 'show', ['artist_id', 'start_time', 'id'],
+                    postgresql_include=['venue_id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_start_time', table_name='show')
+    op.drop_index('ix_show_venue_start_time', table_name='show')
+    op.create_index('ix_show_venue_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_start_time', 'show', ['artist_id', 'start_time'])
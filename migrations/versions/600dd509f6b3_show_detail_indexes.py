@@ -0,0 +1,26 @@
+"""show indexes for the venue and artist detail pages
+
+Revision ID: 600dd509f6b3
+Revises: 7b9321b04ad1
+Create Date: 2026-10-18 12:41:19.030577
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '600dd509f6b3'
+down_revision = '7b9321b04ad1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_start_time', 'show', ['artist_id', 'start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_start_time', table_name='show')
+    op.drop_index('ix_show_venue_start_time', table_name='show')
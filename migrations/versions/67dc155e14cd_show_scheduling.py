@@ -0,0 +1,61 @@
+"""show end times, double_booked flag and per venue/artist exclusion constraints
+
+Revision ID: 67dc155e14cd
+Revises: b7d2e94c1f30
+Create Date: 2026-10-18 17:04:51.902617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '67dc155e14cd'
+down_revision = 'b7d2e94c1f30'
+branch_labels = None
+depends_on = None
+
+# constraint -> the show column it keeps free of overlaps
+CONSTRAINTS = {
+    'ex_show_venue_during': 'venue_id',
+    'ex_show_artist_during': 'artist_id',
+}
+
+
+def upgrade():
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.add_column('show', sa.Column('double_booked', sa.Boolean(), nullable=False,
+                                    server_default=sa.false()))
+    # models.DEFAULT_SHOW_DURATION
+    op.execute("UPDATE show SET end_time = start_time + interval '120 minutes'")
+
+    # shows that already overlap are flagged rather than dropped, so the
+    # constraints can be built; `flask scan-show-conflicts` lists them. The
+    # start_time bounds (scheduling.MAX_DURATION) keep each probe on the
+    # (venue_id, start_time) and (artist_id, start_time) indexes
+    for fk in CONSTRAINTS.values():
+        op.execute(f"""
+        UPDATE show SET double_booked = true
+        WHERE EXISTS (
+          SELECT 1 FROM show other
+          WHERE other.{fk} = show.{fk} AND other.id <> show.id
+            AND other.start_time > show.start_time - interval '24 hours'
+            AND other.start_time < show.end_time
+            AND other.end_time > show.start_time
+        )
+        """)
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for name, fk in CONSTRAINTS.items():
+        op.execute(f"""
+        ALTER TABLE show ADD CONSTRAINT {name}
+        EXCLUDE USING gist ({fk} WITH =, tsrange(start_time, end_time) WITH &&)
+        WHERE (NOT double_booked AND start_time IS NOT NULL)
+        """)
+
+
+def downgrade():
+    for name in CONSTRAINTS:
+        op.execute(f'ALTER TABLE show DROP CONSTRAINT IF EXISTS {name}')
+    op.drop_column('show', 'double_booked')
+    op.drop_column('show', 'end_time')
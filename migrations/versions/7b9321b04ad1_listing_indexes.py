@@ -0,0 +1,28 @@
+"""keyset pagination indexes for the listing pages
+
+Revision ID: 7b9321b04ad1
+Revises: 1fe71b5346b5
+Create Date: 2026-10-18 11:20:05.871342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b9321b04ad1'
+down_revision = '1fe71b5346b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venues_listing', 'venues', ['city', 'state', 'name', 'id'])
+    op.create_index('ix_artists_listing', 'artists', ['name', 'id'])
+    op.create_index('ix_show_listing', 'show', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_listing', table_name='show')
+    op.drop_index('ix_artists_listing', table_name='artists')
+    op.drop_index('ix_venues_listing', table_name='venues')
@@ -0,0 +1,30 @@
+"""updated_at columns on venues, artists and show
+
+Revision ID: a1b8f8a62d6b
+Revises: 56d02d1f0ad0
+Create Date: 2026-10-18 14:52:08.417736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1b8f8a62d6b'
+down_revision = '56d02d1f0ad0'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'show')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
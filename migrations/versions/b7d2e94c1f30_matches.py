@@ -0,0 +1,33 @@
+"""matches table for the precomputed artist and venue recommendations
+
+Revision ID: b7d2e94c1f30
+Revises: 3e3ca5eddb1d
+Create Date: 2026-10-18 16:41:09.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e94c1f30'
+down_revision = '3e3ca5eddb1d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by `flask compute-matches`
+    op.create_table(
+        'matches',
+        sa.Column('kind', sa.String(length=6), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('match_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'entity_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('matches')
@@ -0,0 +1,35 @@
+"""cascade venue and artist deletes to their shows in the database
+
+Revision ID: c4f08a5d2e71
+Revises: 67dc155e14cd
+Create Date: 2026-10-18 17:38:26.470193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f08a5d2e71'
+down_revision = '67dc155e14cd'
+branch_labels = None
+depends_on = None
+
+# show column -> referenced table; the constraints kept Postgres' default
+# names when the show table was created
+FOREIGN_KEYS = {
+    'venue_id': 'venues',
+    'artist_id': 'artists',
+}
+
+
+def upgrade():
+    for column, table in FOREIGN_KEYS.items():
+        op.drop_constraint(f'show_{column}_fkey', 'show', type_='foreignkey')
+        op.create_foreign_key(f'show_{column}_fkey', 'show', table, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    for column, table in FOREIGN_KEYS.items():
+        op.drop_constraint(f'show_{column}_fkey', 'show', type_='foreignkey')
+        op.create_foreign_key(f'show_{column}_fkey', 'show', table, [column], ['id'])
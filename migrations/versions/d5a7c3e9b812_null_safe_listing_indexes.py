@@ -0,0 +1,32 @@
+"""listing indexes on coalesce(..., '') to match the NULL-safe keyset order
+
+Revision ID: d5a7c3e9b812
+Revises: c4f08a5d2e71
+Create Date: 2026-10-18 21:40:12.309417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a7c3e9b812'
+down_revision = 'c4f08a5d2e71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_venues_listing', table_name='venues')
+    op.drop_index('ix_artists_listing', table_name='artists')
+    op.create_index('ix_venues_listing', 'venues', [
+        sa.text("coalesce(city, '')"), sa.text("coalesce(state, '')"), sa.text("coalesce(name, '')"), 'id'
+    ])
+    op.create_index('ix_artists_listing', 'artists', [sa.text("coalesce(name, '')"), 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_artists_listing', table_name='artists')
+    op.drop_index('ix_venues_listing', table_name='venues')
+    op.create_index('ix_venues_listing', 'venues', ['city', 'state', 'name', 'id'])
+    op.create_index('ix_artists_listing', 'artists', ['name', 'id'])
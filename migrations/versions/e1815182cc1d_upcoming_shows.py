@@ -0,0 +1,53 @@
+"""upcoming_shows projection behind /shows
+
+Revision ID: e1815182cc1d
+Revises: a1b8f8a62d6b
+Create Date: 2026-10-18 15:48:31.204817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1815182cc1d'
+down_revision = 'a1b8f8a62d6b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'upcoming_shows',
+        sa.Column('show_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('venue_name', sa.String(), nullable=True),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('artist_name', sa.String(), nullable=True),
+        sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+        sa.ForeignKeyConstraint(['show_id'], ['show.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('show_id')
+    )
+    op.create_index('ix_upcoming_shows_listing', 'upcoming_shows', ['start_time', 'show_id'])
+    op.create_index('ix_upcoming_shows_venue_id', 'upcoming_shows', ['venue_id'])
+    op.create_index('ix_upcoming_shows_artist_id', 'upcoming_shows', ['artist_id'])
+
+    # backfill, and start the watermark that projection.refresh() reads
+    op.execute("""
+    INSERT INTO upcoming_shows (show_id, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link)
+    SELECT show.id, show.start_time, show.venue_id, venues.name, show.artist_id, artists.name, artists.image_link
+    FROM show
+    JOIN venues ON venues.id = show.venue_id
+    JOIN artists ON artists.id = show.artist_id
+    WHERE show.start_time > now()
+    """)
+    op.execute("INSERT INTO watermarks (name, value) VALUES ('upcoming_shows', now())")
+
+
+def downgrade():
+    op.execute("DELETE FROM watermarks WHERE name = 'upcoming_shows'")
+    op.drop_index('ix_upcoming_shows_artist_id', table_name='upcoming_shows')
+    op.drop_index('ix_upcoming_shows_venue_id', table_name='upcoming_shows')
+    op.drop_index('ix_upcoming_shows_listing', table_name='upcoming_shows')
+    op.drop_table('upcoming_shows')
@@ -1,6 +1,47 @@
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, timedelta
 
-db = SQLAlchemy()
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+
+from replicas import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+# tsvector over name, city and genres, maintained by a trigger on postgres
+# (see the search indexes migration). It is only ever read inside search.py
+SearchVector = TSVECTOR().with_variant(db.Text(), 'sqlite')
+
+# text[] on postgres; a JSON list on sqlite, so the schema can be created
+# and searched locally
+Genres = ARRAY(db.String).with_variant(db.JSON(), 'sqlite')
+
+def updated_at_column():
+    # bumped by every ORM or Core UPDATE, used for ETags and incremental jobs
+    return db.Column(db.DateTime, nullable=False, default=datetime.now,
+                     onupdate=datetime.now, server_default=db.func.now(), index=True)
+
+def filter_indexes(table):
+    # filters.py: genres with @> on GIN, then state and city; the trailing
+    # name and id keep filtered listings in keyset order
+    return (
+        db.Index(f'ix_{table}_genres', 'genres', postgresql_using='gin'),
+        db.Index(f'ix_{table}_state_city', 'state', 'city', 'name', 'id'),
+    )
+
+def search_indexes(table):
+    return (
+        db.Index(f'ix_{table}_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index(f'ix_{table}_name_trgm', 'name',
+                 postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+# length of a show booked without an end time
+DEFAULT_SHOW_DURATION = timedelta(minutes=120)
+
+def show_end_time(context):
+    # inserts that only give a start time (imports, seeds) get the default
+    # length, row by row in executemany batches too
+    start_time = context.get_current_parameters().get('start_time')
+    return start_time and start_time + DEFAULT_SHOW_DURATION
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -8,10 +49,15 @@ db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = search_indexes('venues') + filter_indexes('venues') + (
+        # keyset order of the /venues listing (queries.VENUE_LISTING_ORDER)
+        db.Index('ix_venues_listing', db.text("coalesce(city, '')"), db.text("coalesce(state, '')"),
+                 db.text("coalesce(name, '')"), 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(Genres, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -21,7 +67,14 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='venue', lazy='joined', cascade="all, delete")
+    search_vector = db.deferred(db.Column(SearchVector))
+    # maintained by counters.py
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = updated_at_column()
+    # pages read shows in bounded slices (queries.entity_shows), never through this;
+    # passive_deletes leaves deleting them to the ON DELETE CASCADE foreign key
+    shows = db.relationship('Show', backref='venue', lazy='select', cascade="all, delete", passive_deletes=True)
 
 
 
@@ -30,29 +83,99 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = search_indexes('artists') + filter_indexes('artists') + (
+        db.Index('ix_artists_listing', db.text("coalesce(name, '')"), 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    genres = db.Column(Genres, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue= db.Column(db.Boolean)
     website = db.Column(db.String(500))
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='artist', lazy='joined', cascade="all, delete")
+    search_vector = db.deferred(db.Column(SearchVector))
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = updated_at_column()
+    shows = db.relationship('Show', backref='artist', lazy='select', cascade="all, delete", passive_deletes=True)
 
     def __repr__(self):
         return f'<Artist ID: {self.id}, name: {self.name}>'
 
 class Show(db.Model):
+    __table_args__ = (
+        db.Index('ix_show_listing', 'start_time', 'id'),
+        # past/upcoming splits on the venue and artist pages, ordered the way
+        # queries.entity_shows reads them and covering the counterpart id
+        db.Index('ix_show_venue_start_time', 'venue_id', 'start_time', 'id',
+                 postgresql_include=['artist_id']),
+        db.Index('ix_show_artist_start_time', 'artist_id', 'start_time', 'id',
+                 postgresql_include=['venue_id']),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     # define foreign keys that map to the primary keys in the respective parent tables
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
+    # deleting a venue or an artist deletes its shows in the database (purge.py)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime)
+    # the venue and the artist are booked until end_time; on Postgres two
+    # exclusion constraints keep bookings from overlapping, except for shows
+    # flagged double_booked (see scheduling.py and its migration)
+    end_time = db.Column(db.DateTime, default=show_end_time)
+    double_booked = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = updated_at_column()
 
     def __repr__(self):
         return f'<Show ID: {self.id}, artist id: {self.artist_id}, venue id: {self.venue_id}>'
+
+class UpcomingShow(db.Model):
+    __tablename__ = 'upcoming_shows'
+    __table_args__ = (
+        db.Index('ix_upcoming_shows_listing', 'start_time', 'show_id'),
+        db.Index('ix_upcoming_shows_venue_id', 'venue_id'),
+        db.Index('ix_upcoming_shows_artist_id', 'artist_id'),
+    )
+
+    # denormalized copy of the upcoming shows with the names and picture the
+    # /shows tiles need, maintained by projection.py
+    show_id = db.Column(db.Integer, db.ForeignKey('show.id', ondelete='CASCADE'), primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    venue_name = db.Column(db.String)
+    artist_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+
+    def __repr__(self):
+        return f'<UpcomingShow show id: {self.show_id}, start time: {self.start_time}>'
+
+class Match(db.Model):
+    __tablename__ = 'matches'
+
+    # the best venues for each artist (kind 'artist') and artists for each
+    # venue (kind 'venue'), written by matchmaking.py. The primary key is
+    # also the detail pages' lookup order
+    kind = db.Column(db.String(6), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    match_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<Match {self.kind} {self.entity_id} #{self.rank}: {self.match_id}>'
+
+class Watermark(db.Model):
+    __tablename__ = 'watermarks'
+
+    # bookkeeping for incremental jobs, keyed by job name
+    name = db.Column(db.String(120), primary_key=True)
+    value = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<Watermark {self.name}: {self.value}>'
@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import DateTime, tuple_
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# Pages seek past the sort key of the last row they showed instead of using
+# OFFSET, so with an index on the sort columns every page costs the same no
+# matter how deep into the table it is.
+
+def encode_cursor(row, columns):
+    values = []
+    for column in columns:
+        value = getattr(row, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_value(column, value):
+    # a cursor comes from the client, so every value must have its column's type
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError(f'{column.key}: not a date')
+        return datetime.fromisoformat(value)
+    if isinstance(value, bool) or not isinstance(value, column.type.python_type):
+        raise ValueError(f'{column.key}: not a {column.type.python_type.__name__}')
+    return value
+
+def decode_cursor(cursor, columns):
+    # None for anything that isn't a cursor encode_cursor() made for these
+    # columns, so a mangled link shows the first page rather than an error
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [decode_value(column, value) for column, value in zip(columns, values)]
+    except ValueError:
+        return None
+
+def page_size(requested=None):
+    size = requested or current_app.config['PAGE_SIZE']
+    return min(max(size, 1), current_app.config['MAX_PAGE_SIZE'])
+
+def page_args():
+    # cursor and size arguments of the current listing request
+    return {
+        "after": request.args.get('after'),
+        "before": request.args.get('before'),
+        "per_page": request.args.get('per_page', type=int)
+    }
+
+def keyset_select(query, columns, after=None, before=None, per_page=None):
+    '''
+    Split a keyset page into the statement to run and a function turning its
+    rows into the page, so sync and async callers share the logic.
+    '''
+    per_page = page_size(per_page)
+    key = tuple_(*columns)
+
+    before = before and decode_cursor(before, columns)
+    after = after and decode_cursor(after, columns)
+
+    if before:
+        # walk backwards from the cursor, then flip the page back around
+        statement = query.where(key < tuple_(*before)) \
+            .order_by(*[column.desc() for column in columns]) \
+            .limit(per_page + 1)
+    else:
+        if after:
+            query = query.where(key > tuple_(*after))
+        statement = query.order_by(*columns).limit(per_page + 1)
+
+    def page(rows):
+        has_more = len(rows) > per_page
+        if before:
+            items = list(reversed(rows[:per_page]))
+            has_prev, has_next = has_more, True
+        else:
+            items = rows[:per_page]
+            has_prev, has_next = bool(after), has_more
+        return {
+            "items": items,
+            "next": encode_cursor(items[-1], columns) if items and has_next else None,
+            "prev": encode_cursor(items[0], columns) if items and has_prev else None,
+        }
+
+    return statement, page
+
+def keyset_page(query, columns, after=None, before=None, per_page=None):
+    '''
+    Return one page of the select() `query` ordered by `columns` (which must
+    end with a unique column, usually the id) as {"items", "next", "prev"},
+    where next and prev are opaque cursors for the neighbouring pages or None.
+    '''
+    statement, page = keyset_select(query, columns, after, before, per_page)
+    return page(db.session.execute(statement).all())
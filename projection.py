@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+
+from flask import request
+from sqlalchemy import insert, select
+
+from models import db, Venue, Artist, Show, UpcomingShow, Watermark
+
+#----------------------------------------------------------------------------#
+# Upcoming shows projection.
+#----------------------------------------------------------------------------#
+
+# /shows reads only upcoming_shows: one row per upcoming show carrying the
+# venue name and the artist name and picture, so a page is a single range
+# scan with no joins. Writes through the app keep it current in their own
+# transaction (add_show, rename, remove). refresh() runs on a schedule to
+# drop shows that have started and to catch up with changes made around the
+# app, such as bulk imports, from the 'upcoming_shows' watermark on.
+
+WATERMARK = 'upcoming_shows'
+
+# changes are re-scanned this far behind the watermark, so a transaction
+# still in flight during one refresh is picked up by the next
+SETTLE_TIME = timedelta(seconds=60)
+
+PROJECTION_COLUMNS = (
+    UpcomingShow.show_id,
+    UpcomingShow.start_time,
+    UpcomingShow.venue_id,
+    UpcomingShow.venue_name,
+    UpcomingShow.artist_id,
+    UpcomingShow.artist_name,
+    UpcomingShow.artist_image_link,
+)
+
+# listing order, backed by ix_upcoming_shows_listing
+UPCOMING_LISTING_ORDER = (UpcomingShow.start_time, UpcomingShow.show_id)
+
+# the projection column holding each parent model's denormalized fields
+DENORMALIZED = {
+    Venue: (UpcomingShow.venue_id, {UpcomingShow.venue_name: Venue.name}),
+    Artist: (UpcomingShow.artist_id, {UpcomingShow.artist_name: Artist.name,
+                                      UpcomingShow.artist_image_link: Artist.image_link}),
+}
+
+def source(*criteria):
+    # projection rows computed from the normalized tables
+    return select(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name,
+        Show.artist_id,
+        Artist.name,
+        Artist.image_link
+    ).join(Venue, Venue.id == Show.venue_id) \
+     .join(Artist, Artist.id == Show.artist_id) \
+     .where(*criteria)
+
+def project(*criteria):
+    db.session.execute(
+        insert(UpcomingShow).from_select([column.key for column in PROJECTION_COLUMNS], source(*criteria))
+    )
+
+def add_show(show, now=None):
+    '''
+    Project a new show. Runs inside the caller's transaction, after the show
+    was flushed.
+    '''
+    if show.start_time > (now or datetime.now()):
+        project(Show.id == show.id)
+
+def copy_fields(model, criterion):
+    fk, fields = DENORMALIZED[model]
+    values = {column: select(field).where(model.id == fk).scalar_subquery()
+              for column, field in fields.items()}
+    db.session.query(UpcomingShow).filter(criterion) \
+        .update(values, synchronize_session=False)
+
+def rename(model, *entity_ids):
+    '''
+    Copy edited venue or artist names (and pictures) into their shows.
+    '''
+    # the edit has to reach the database before it can be copied
+    db.session.flush()
+    fk, _ = DENORMALIZED[model]
+    copy_fields(model, fk.in_(entity_ids))
+
+def remove(model, entity_id, *criteria):
+    '''
+    Drop a venue or artist's projected shows, or those matching `criteria`,
+    for deletes (purge.py). The show FK cascades on Postgres; SQLite doesn't
+    enforce it by default.
+    '''
+    fk, _ = DENORMALIZED[model]
+    db.session.query(UpcomingShow).filter(fk == entity_id, *criteria).delete(synchronize_session=False)
+
+def refresh(now=None):
+    '''
+    Drop shows that have started, project shows added or changed since the
+    watermark and copy edited names. Meant to run periodically, e.g. from
+    cron via `flask refresh-upcoming-shows`.
+    '''
+    now = now or datetime.now()
+    mark = Watermark.query.filter_by(name=WATERMARK).with_for_update().one_or_none()
+    if mark is None:
+        return rebuild(now)
+    since = mark.value - SETTLE_TIME
+
+    db.session.query(UpcomingShow).filter(UpcomingShow.start_time <= now) \
+        .delete(synchronize_session=False)
+
+    changed = select(Show.id).where(Show.updated_at > since)
+    db.session.query(UpcomingShow).filter(UpcomingShow.show_id.in_(changed)) \
+        .delete(synchronize_session=False)
+    project(Show.updated_at > since, Show.start_time > now)
+
+    for model, (fk, _) in DENORMALIZED.items():
+        copy_fields(model, fk.in_(select(model.id).where(model.updated_at > since)))
+
+    mark.value = now
+    db.session.commit()
+
+def rebuild(now=None):
+    '''
+    Recompute the whole projection and reset the watermark.
+    '''
+    now = now or datetime.now()
+    mark = Watermark.query.filter_by(name=WATERMARK).with_for_update().one_or_none()
+    if mark is None:
+        mark = Watermark(name=WATERMARK, value=now)
+        db.session.add(mark)
+
+    db.session.query(UpcomingShow).delete(synchronize_session=False)
+    project(Show.start_time > now)
+
+    mark.value = now
+    db.session.commit()
+
+#----------------------------------------------------------------------------#
+# Listing.
+#----------------------------------------------------------------------------#
+
+def date_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def date_range_args():
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD, both days included
+    start, end = date_arg('from'), date_arg('to')
+    return start, end and end + timedelta(days=1)
+
+def upcoming_listing(start=None, end=None, now=None):
+    # rows the last refresh hasn't dropped yet are filtered out here
+    query = select(*PROJECTION_COLUMNS) \
+        .where(UpcomingShow.start_time > max(now or datetime.now(), start or datetime.min))
+    if end is not None:
+        query = query.where(UpcomingShow.start_time < end)
+    return query
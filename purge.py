@@ -0,0 +1,160 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import select
+
+import counters
+import projection
+from models import db, Venue, Artist, Show, UpcomingShow, Match, Watermark
+from queries import SHOW_FOREIGN_KEYS
+
+#----------------------------------------------------------------------------#
+# Deleting venues and artists.
+#----------------------------------------------------------------------------#
+
+# The show foreign keys cascade in the database (see the cascading show
+# deletes migration) and the relationships are passive_deletes, so deleting
+# a venue or an artist is a single DELETE however many shows it has: no
+# show is loaded or deleted one by one. SQLite doesn't enforce foreign keys
+# by default, so there the shows are deleted with one more statement.
+#
+# A long history still makes that one transaction long, so an entity with
+# more than PURGE_BACKGROUND_THRESHOLD shows is purged in the background
+# instead: its shows go PURGE_BATCH_SIZE at a time, each batch in its own
+# short transaction that keeps the counters and projection in step, then
+# the row itself. A purge cut short (say the worker was recycled) leaves a
+# consistent, smaller history behind; deleting again, or
+# `flask purge <kind> <id>`, finishes it.
+#
+# Each delete, and each purge batch, starts by locking the row (SELECT ...
+# FOR UPDATE), so two deletes of the same venue or artist can't both
+# release its shows from the counters; the second finds it gone. A process
+# also runs at most one background purge per venue or artist.
+#
+# Deletes leave no trace in the remaining rows, so every one also moves the
+# DELETES_WATERMARK watermark, which the API collection ETags include.
+
+# kind as used in URLs and commands -> model
+KINDS = {
+    'venue': Venue,
+    'artist': Artist,
+}
+
+KIND_NAMES = {model: kind for kind, model in KINDS.items()}
+
+DELETES_WATERMARK = 'deletes'
+
+# (kind, id) of the background purges running in this process
+purging = set()
+purging_lock = threading.Lock()
+
+def show_count(model, entity_id):
+    # from the counter columns, so no show is counted at request time
+    return db.session.execute(
+        select(model.num_upcoming_shows + model.num_past_shows).where(model.id == entity_id)
+    ).scalar()
+
+def forget_matches(model, entity_id):
+    # matchmaking.py rows recommending it, or recommended for it
+    db.session.query(Match).filter(Match.kind == KIND_NAMES[model], Match.entity_id == entity_id) \
+        .delete(synchronize_session=False)
+    db.session.query(Match).filter(Match.kind != KIND_NAMES[model], Match.match_id == entity_id) \
+        .delete(synchronize_session=False)
+
+def record_deletes(now=None):
+    # one UPDATE, which also takes the row lock, once the watermark exists
+    now = now or datetime.now()
+    moved = db.session.query(Watermark).filter(Watermark.name == DELETES_WATERMARK) \
+        .update({Watermark.value: now}, synchronize_session=False)
+    if not moved:
+        db.session.add(Watermark(name=DELETES_WATERMARK, value=now))
+
+def lock(model, entity_id):
+    '''
+    Share-lock the counters watermark, then lock the row: the order
+    rollover() takes them in, so the two can't deadlock. Returns the
+    watermark's value for release_shows(), None when the row is gone.
+    '''
+    mark = counters.as_of()
+    found = db.session.execute(
+        select(model.id).where(model.id == entity_id).with_for_update()
+    ).scalar()
+    return mark if found is not None else None
+
+def delete_entity(model, entity_id):
+    '''
+    Delete a venue or artist and its shows in the caller's transaction.
+    Returns False, deleting nothing, when it no longer exists.
+    '''
+    mark = lock(model, entity_id)
+    if mark is None:
+        return False
+    fk = SHOW_FOREIGN_KEYS[model]
+    # uncount its shows from the other side of each one
+    counters.release_shows(model, entity_id, mark=mark)
+    if db.engine.dialect.name != 'postgresql':
+        projection.remove(model, entity_id)
+        db.session.query(Show).filter(fk == entity_id).delete(synchronize_session=False)
+    forget_matches(model, entity_id)
+    db.session.query(model).filter(model.id == entity_id).delete(synchronize_session=False)
+    record_deletes()
+    return True
+
+def purge(model, entity_id, batch_size, on_batch=None):
+    '''
+    Delete a venue or artist's shows batch_size at a time, committing after
+    each batch, then the row itself. Returns the number of shows deleted.
+    '''
+    fk = SHOW_FOREIGN_KEYS[model]
+    purged = 0
+    while True:
+        mark = lock(model, entity_id)
+        if mark is None:
+            # deleted meanwhile, by another purge or request
+            db.session.rollback()
+            return purged
+        show_ids = db.session.execute(
+            select(Show.id).where(fk == entity_id).order_by(Show.id).limit(batch_size)
+        ).scalars().all()
+        if not show_ids:
+            break
+        counters.release_shows(model, entity_id, Show.id.in_(show_ids), mark=mark)
+        projection.remove(model, entity_id, UpcomingShow.show_id.in_(show_ids))
+        db.session.query(Show).filter(Show.id.in_(show_ids)).delete(synchronize_session=False)
+        record_deletes()
+        db.session.commit()
+        purged += len(show_ids)
+        if on_batch:
+            on_batch(purged)
+    delete_entity(model, entity_id)
+    db.session.commit()
+    return purged
+
+def purge_in_background(app, model, entity_id, on_done=None):
+    '''
+    Run purge() on a daemon thread with its own app context and session.
+    Returns None, starting nothing, when this process is already purging it.
+    '''
+    key = (KIND_NAMES[model], entity_id)
+    with purging_lock:
+        if key in purging:
+            return None
+        purging.add(key)
+
+    def run():
+        with app.app_context():
+            try:
+                purge(model, entity_id, app.config['PURGE_BATCH_SIZE'])
+                if on_done:
+                    on_done()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('purging %s %s failed', KIND_NAMES[model], entity_id)
+            finally:
+                db.session.remove()
+                with purging_lock:
+                    purging.discard(key)
+
+    thread = threading.Thread(target=run, name=f'purge-{KIND_NAMES[model]}-{entity_id}', daemon=True)
+    thread.start()
+    return thread
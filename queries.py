@@ -0,0 +1,171 @@
+from datetime import datetime
+from itertools import groupby
+
+from flask import g
+from sqlalchemy import func, select
+from sqlalchemy.orm import noload
+
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Loading profiles.
+#----------------------------------------------------------------------------#
+
+LOAD_PROFILES = ('detail',)
+
+# the other side of a show, as seen from each parent model. Show.venue and
+# Show.artist are backrefs, so they are looked up by name once mappers exist
+SHOW_COUNTERPARTS = {
+    Venue: ('artist', Artist),
+    Artist: ('venue', Venue),
+}
+
+# the show column pointing back at each parent model
+SHOW_FOREIGN_KEYS = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+def load_profile(model, profile):
+    '''
+    Return the loader options for a Venue or Artist query:
+
+    detail  every column, shows are never loaded (detail pages, edit forms)
+
+    The pages read their shows in bounded slices with entity_shows() rather
+    than through the relationship.
+    '''
+    if profile not in LOAD_PROFILES:
+        raise ValueError(f'unknown load profile: {profile}')
+    return [noload(model.shows)]
+
+#----------------------------------------------------------------------------#
+# Read-side loaders.
+#----------------------------------------------------------------------------#
+
+def sort_key(column):
+    # a NULL fails every keyset comparison (NULL > x is never true), so
+    # pages would skip or repeat those rows; nullable text keys sort, compare
+    # and are selected as '' instead
+    return func.coalesce(column, '').label(column.key)
+
+VENUE_CITY, VENUE_STATE, VENUE_NAME = map(sort_key, (Venue.city, Venue.state, Venue.name))
+ARTIST_NAME = sort_key(Artist.name)
+
+# listing sort orders, each backed by an index so keyset pages stay cheap
+VENUE_LISTING_ORDER = (VENUE_CITY, VENUE_STATE, VENUE_NAME, Venue.id)
+ARTIST_LISTING_ORDER = (ARTIST_NAME, Artist.id)
+SHOW_LISTING_ORDER = (Show.start_time, Show.id)
+
+# the listings are plain select() statements, so the async read path
+# (async_app.py) runs exactly the same SQL as the views
+
+def venue_listing():
+    # counts come from the counter columns maintained by counters.py
+    return select(
+        VENUE_CITY,
+        VENUE_STATE,
+        Venue.id,
+        VENUE_NAME,
+        Venue.num_upcoming_shows
+    )
+
+def artist_listing():
+    return select(Artist.id, ARTIST_NAME)
+
+def show_listing():
+    return select(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Venue, Venue.id == Show.venue_id) \
+     .join(Artist, Artist.id == Show.artist_id)
+
+def venue_areas(rows):
+    '''
+    Group venue_listing() rows, sorted by VENUE_LISTING_ORDER, into the
+    area -> venues structure used by pages/venues.html.
+    '''
+    # rows come back sorted by area, so one pass is enough to group them
+    areas = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [
+                {
+                    "id": venue.id,
+                    "name": venue.name,
+                    "num_upcoming_shows": venue.num_upcoming_shows
+                }
+                for venue in venues
+            ]
+        })
+    return areas
+
+def show_counterpart_ids(model, entity_id):
+    # venues an artist has played at, or artists a venue has hosted
+    counterpart_fk = SHOW_FOREIGN_KEYS[SHOW_COUNTERPARTS[model][1]]
+    rows = db.session.query(counterpart_fk) \
+        .filter(SHOW_FOREIGN_KEYS[model] == entity_id) \
+        .distinct() \
+        .all()
+    return [row[0] for row in rows]
+
+def request_now():
+    # one "now" per request, so every query behind a page splits past from
+    # upcoming at the same instant
+    if 'now' not in g:
+        g.now = datetime.now()
+    return g.now
+
+def entity_shows(entity, now, upcoming_limit, past_limit):
+    '''
+    Upcoming and past shows of a loaded venue or artist as two bounded
+    queries, both served by the (venue_id|artist_id, start_time) indexes.
+    The totals come from its counter columns (see counters.py), which split
+    at the counters watermark rather than `now` and so may lag the lists
+    until the next rollover.
+    '''
+    model = type(entity)
+    counterpart, counterpart_model = SHOW_COUNTERPARTS[model]
+    counterpart_fk = SHOW_FOREIGN_KEYS[counterpart_model]
+
+    shows = db.session.query(
+        counterpart_fk.label('counterpart_id'),
+        counterpart_model.name.label('counterpart_name'),
+        counterpart_model.image_link.label('counterpart_image_link'),
+        Show.start_time
+    ).join(counterpart_model, counterpart_model.id == counterpart_fk) \
+     .filter(SHOW_FOREIGN_KEYS[model] == entity.id)
+
+    upcoming = shows.filter(Show.start_time > now) \
+        .order_by(Show.start_time, Show.id) \
+        .limit(upcoming_limit) \
+        .all()
+    past = shows.filter(Show.start_time <= now) \
+        .order_by(Show.start_time.desc(), Show.id.desc()) \
+        .limit(past_limit) \
+        .all()
+
+    def tiles(rows):
+        return [
+            {
+                f'{counterpart}_id': row.counterpart_id,
+                f'{counterpart}_name': row.counterpart_name,
+                f'{counterpart}_image_link': row.counterpart_image_link,
+                'start_time': row.start_time
+            }
+            for row in rows
+        ]
+
+    return {
+        'upcoming_shows': tiles(upcoming),
+        'upcoming_shows_count': entity.num_upcoming_shows,
+        'past_shows': tiles(past),
+        'past_shows_count': entity.num_past_shows
+    }
@@ -0,0 +1,96 @@
+import random
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+from sqlalchemy.sql import Select
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Views marked with @read_only send their SELECTs to a replica,
+# picked at random per session so one page reads a single snapshot.
+# Everything else (writes, SELECT ... FOR UPDATE, unmarked views, CLI
+# commands) stays on the primary. A user who just wrote reads from the
+# primary for REPLICA_STICKY_SECONDS afterwards, long enough for the
+# replicas to catch up, so their own change never seems to disappear.
+#
+# Replicas are ordinary Flask-SQLAlchemy binds named replica0, replica1, ...
+# (see config.py), so they share the primary's engine options.
+
+REPLICA_BIND_PREFIX = 'replica'
+
+def replica_binds(config):
+    return sorted(key for key in config.get('SQLALCHEMY_BINDS') or {}
+                  if key.startswith(REPLICA_BIND_PREFIX))
+
+def sticky():
+    # read-your-writes: this user wrote recently, or this request already did
+    return g.get('wrote') or session.get('primary_until', 0) > time.time()
+
+def read_from_replica():
+    # whether this request has read anything from a replica
+    return has_request_context() and g.get('read_replica', False)
+
+def is_read(clause):
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        self.replica = None
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # SQLAlchemy passes extra keywords (e.g. when a do_orm_execute hook
+        # re-invokes a statement), which Flask-SQLAlchemy's get_bind refuses
+        if not has_request_context():
+            return super().get_bind(mapper, clause)
+
+        if self._flushing or (clause is not None and not is_read(clause)):
+            g.wrote = True
+        elif g.get('read_only') and not sticky():
+            binds = replica_binds(self.app.config)
+            if binds:
+                if self.replica is None:
+                    self.replica = random.choice(binds)
+                g.read_replica = True
+                return self.db.get_engine(self.app, bind=self.replica)
+        return super().get_bind(mapper, clause)
+
+    def close(self):
+        super().close()
+        self.replica = None
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+class ReadReplicas:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.remember_write)
+
+    def remember_write(self, response):
+        if g.get('wrote'):
+            session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
+
+def read_only(view):
+    '''
+    Let `view` read from a replica, unless the user is sticky.
+    '''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
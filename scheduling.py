@@ -0,0 +1,191 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from models import db, Show, DEFAULT_SHOW_DURATION
+
+#----------------------------------------------------------------------------#
+# Scheduling conflicts.
+#----------------------------------------------------------------------------#
+
+# A show occupies its venue and its artist from start_time to end_time. Two
+# shows of the same venue, or of the same artist, conflict when those
+# intervals overlap (back to back is fine).
+#
+# create_show_submission() checks a new show with conflicts() before
+# inserting it and, depending on SHOW_CONFLICTS, rejects it or lists it with
+# double_booked set. On Postgres two exclusion constraints over
+# tsrange(start_time, end_time) (see the show scheduling migration) reject
+# any overlap that slips past the check, e.g. two bookings racing each
+# other; double-booked shows are left out of them. scan() finds every
+# conflict among the existing shows, for `flask scan-show-conflicts`.
+
+# no show runs longer; this bounds how far back an overlapping show can
+# start, which keeps every check a short range scan of the
+# (venue_id, start_time) and (artist_id, start_time) indexes
+MAX_DURATION = timedelta(hours=24)
+
+# resource a show books -> its column
+RESOURCES = {
+    'venue': Show.venue_id,
+    'artist': Show.artist_id,
+}
+
+def end_time(start_time, minutes=None):
+    if start_time is None:
+        return None
+    if minutes is None:
+        return start_time + DEFAULT_SHOW_DURATION
+    duration = timedelta(minutes=minutes)
+    if not timedelta(0) < duration <= MAX_DURATION:
+        raise ValueError(f'a show lasts between 1 minute and {MAX_DURATION}, not {minutes} minutes')
+    return start_time + duration
+
+def overlapping(column, resource_id, start_time, end_time):
+    return and_(
+        column == resource_id,
+        Show.start_time < end_time,
+        Show.start_time > start_time - MAX_DURATION,
+        Show.end_time > start_time,
+    )
+
+def conflicts(venue_id, artist_id, start_time, end_time, exclude_id=None):
+    '''
+    Shows that overlap start_time..end_time at the venue or for the artist,
+    as (resource, show) pairs.
+    '''
+    found = []
+    for resource, resource_id in (('venue', venue_id), ('artist', artist_id)):
+        query = Show.query.filter(overlapping(RESOURCES[resource], resource_id, start_time, end_time))
+        if exclude_id is not None:
+            query = query.filter(Show.id != exclude_id)
+        found.extend((resource, show) for show in query.order_by(Show.start_time))
+    return found
+
+def conflicts_many(rows):
+    '''
+    conflicts() for every new show in `rows` (column value dicts), as
+    {position: [(resource, show)]} for the positions that have any. One
+    query per resource covers the whole batch, each row an index range
+    scan of it.
+    '''
+    found = defaultdict(list)
+    for resource, column in RESOURCES.items():
+        if not rows:
+            break
+        shows = Show.query.filter(or_(*[
+            overlapping(column, row[column.key], row['start_time'], row['end_time']) for row in rows
+        ])).order_by(Show.start_time)
+        booked = defaultdict(list)
+        for show in shows:
+            booked[getattr(show, column.key)].append(show)
+        for i, row in enumerate(rows):
+            for show in booked.get(row[column.key], ()):
+                if show.start_time < row['end_time'] and show.end_time > row['start_time']:
+                    found[i].append((resource, show))
+    return dict(found)
+
+def describe(found):
+    return '; '.join(
+        f'{resource} already booked from {show.start_time:%Y-%m-%d %H:%M} '
+        f'to {show.end_time:%H:%M} (show {show.id})'
+        for resource, show in found
+    )
+
+def check_batch(rows, policy):
+    '''
+    Check new show `rows` against the existing bookings and each other, for
+    batch writes and imports. Sets each row's double_booked and returns
+    {position: what it overlaps} for the ones that overlap anything.
+
+    Rows are taken in order, as if booked one at a time: a row clashes with
+    the earlier rows it overlaps, except, when policy is 'reject', the ones
+    rejected themselves. Earlier batches of an import are already booked,
+    so the outcome never depends on where the batches split.
+    '''
+    earlier = defaultdict(set)
+    for i, j in overlapping_pairs(rows):
+        earlier[j].add(i)
+    booked = conflicts_many(rows)
+    clashes = {}
+    for i, row in enumerate(rows):
+        found = booked.get(i)
+        clash = describe(found) if found else None
+        if any(policy != 'reject' or k not in clashes for k in earlier[i]):
+            clash = '; '.join(filter(None, [clash, 'overlaps an earlier show of this batch']))
+        row['double_booked'] = bool(clash)
+        if clash:
+            clashes[i] = clash
+    return clashes
+
+#----------------------------------------------------------------------------#
+# Bulk scan.
+#----------------------------------------------------------------------------#
+
+def sweep(bookings):
+    '''
+    Yield (resource id, show id, other show id) for every overlapping pair
+    among (resource id, show id, start_time, end_time) tuples sorted by
+    resource and start_time.
+
+    A heap of the shows still running holds everything the next show can
+    overlap, so each show costs O(log k) for k concurrent bookings, however
+    many shows there are.
+    '''
+    resource_id, running = None, []
+    for row_resource, show_id, starts, ends in bookings:
+        if row_resource != resource_id:
+            resource_id, running = row_resource, []
+        while running and running[0][0] <= starts:
+            heapq.heappop(running)
+        for _, other_id in running:
+            yield resource_id, min(show_id, other_id), max(show_id, other_id)
+        heapq.heappush(running, (ends, show_id))
+
+def scan(resource, batch_size=10000):
+    '''
+    Yield (resource id, show id, other show id) for every overlapping pair
+    of existing shows at one venue or of one artist. The shows are streamed
+    once in sweep() order, straight off the (resource, start_time) index.
+    '''
+    column = RESOURCES[resource]
+    rows = db.session.execute(
+        select(column, Show.id, Show.start_time, Show.end_time)
+            .where(Show.start_time.isnot(None))
+            .order_by(column, Show.start_time, Show.id)
+            .execution_options(yield_per=batch_size)
+    )
+    yield from sweep(rows)
+
+def overlapping_pairs(rows):
+    '''
+    Yield (position, later position) for every two of the new show `rows`
+    (column value dicts) that overlap at the same venue or of the same
+    artist.
+    '''
+    for column in RESOURCES.values():
+        # sweep() order, with the position standing in for the show id
+        bookings = sorted(((row[column.key], i, row['start_time'], row['end_time'])
+                           for i, row in enumerate(rows)),
+                          key=lambda booking: (booking[0], booking[2], booking[1]))
+        for _, i, j in sweep(bookings):
+            yield i, j
+
+def set_flag(show_ids, value):
+    ids = sorted(show_ids)
+    for start in range(0, len(ids), 1000):
+        db.session.execute(
+            update(Show).where(Show.id.in_(ids[start:start + 1000])).values(double_booked=value)
+        )
+
+def flag(show_ids):
+    '''
+    Mark exactly `show_ids` as double booked. New flags go first, so the
+    exclusion constraints never see two unflagged overlapping shows.
+    '''
+    flagged = {id for id, in db.session.execute(select(Show.id).where(Show.double_booked))}
+    set_flag(set(show_ids) - flagged, True)
+    set_flag(flagged - set(show_ids), False)
+    db.session.commit()
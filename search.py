@@ -0,0 +1,112 @@
+from math import ceil
+
+from flask import current_app
+from sqlalchemy import case, func, or_, select
+
+from filters import apply_filters
+from models import db
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def escape_like(term):
+    # keep user input from acting as LIKE wildcards
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def postgres_ranking(model, term):
+    '''
+    Match on the trigram index (partial, case-insensitive name matches) or
+    the tsvector index (whole words in name, city and genres), ranked by the
+    better of the two scores.
+    '''
+    tsquery = func.plainto_tsquery('simple', term)
+    match = or_(
+        model.name.ilike(f'%{escape_like(term)}%', escape='\\'),
+        model.search_vector.op('@@')(tsquery)
+    )
+    rank = func.greatest(
+        func.similarity(model.name, term),
+        func.ts_rank(model.search_vector, tsquery)
+    )
+    return match, rank.desc()
+
+def fallback_ranking(model, term):
+    '''
+    SQLite fallback: partial match on name or city, exact names first, then
+    prefixes, then anything containing the term.
+    '''
+    pattern = escape_like(term.lower())
+    name = func.lower(model.name)
+    match = or_(
+        name.like(f'%{pattern}%', escape='\\'),
+        func.lower(model.city).like(f'%{pattern}%', escape='\\')
+    )
+    rank = case(
+        (name == term.lower(), 0),
+        (name.like(f'{pattern}%', escape='\\'), 1),
+        (name.like(f'%{pattern}%', escape='\\'), 2),
+        else_=3
+    )
+    return match, rank
+
+def search_query(model, term, dialect, filters=None, cap=None):
+    '''
+    Ranked (id, name, num_upcoming_shows) matches, unpaginated. With a cap,
+    a subquery keeps only the best `cap` matches in rank order (a top-N
+    sort), so a broad term never fully sorts or pages through the table.
+    '''
+    query = apply_filters(select(model.id, model.name, model.num_upcoming_shows), model, filters)
+    order = (model.name, model.id)
+    if term:
+        if dialect == 'postgresql':
+            match, rank = postgres_ranking(model, term)
+        else:
+            match, rank = fallback_ranking(model, term)
+        query = query.where(match)
+        order = (rank,) + order
+    if cap is not None:
+        # rank before limiting, or the cap keeps an arbitrary set of matches
+        candidates = query.with_only_columns(model.id).order_by(*order).limit(cap).scalar_subquery()
+        query = select(model.id, model.name, model.num_upcoming_shows).where(model.id.in_(candidates))
+    return query.order_by(*order)
+
+def count_query(query, model, cap):
+    # bounded count: stop scanning once the cap is reached
+    return select(func.count()).select_from(
+        query.with_only_columns(model.id).order_by(None).limit(cap).subquery()
+    )
+
+def search_window(count, page, per_page, cap):
+    pages = max(ceil(count / per_page), 1)
+    page = min(max(page, 1), pages)
+    offset = (page - 1) * per_page
+    return {
+        "page": page,
+        "pages": pages,
+        "offset": offset,
+        "limit": max(min(per_page, cap - offset), 0)
+    }
+
+def search(model, term, page=1, per_page=None, cap=None, filters=None):
+    '''
+    Relevance-ranked search over a Venue or Artist table, narrowed by
+    filters.filter_args(). Returns a page of (id, name, num_upcoming_shows)
+    rows along with the total number of matches, which is never counted
+    past SEARCH_RESULT_CAP.
+    '''
+    per_page = per_page or current_app.config['SEARCH_PAGE_SIZE']
+    cap = cap or current_app.config['SEARCH_RESULT_CAP']
+
+    query = search_query(model, term.strip(), db.engine.dialect.name, filters, cap)
+    count = db.session.execute(count_query(query, model, cap)).scalar()
+    window = search_window(count, page, per_page, cap)
+    rows = db.session.execute(query.offset(window["offset"]).limit(window["limit"])).all()
+
+    return {
+        "count": count,
+        "data": rows,
+        "page": window["page"],
+        "pages": window["pages"],
+        "capped": count >= cap
+    }
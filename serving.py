@@ -0,0 +1,101 @@
+import os
+
+from flask import current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+#----------------------------------------------------------------------------#
+# Serving checks.
+#----------------------------------------------------------------------------#
+
+# Each worker process has its own connection pool, so the database sees up
+# to workers * (pool size + overflow) connections. check_pool_size() runs
+# once before the workers start (see gunicorn.conf.py) and refuses a layout
+# that could exhaust the server's connections.
+
+class PoolSizeError(Exception):
+    pass
+
+def pool_capacity(config):
+    '''
+    Most connections one process can hold, None for non-pooled engines.
+    '''
+    options = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    if 'pool_size' not in options:
+        return None
+    return options['pool_size'] + options.get('max_overflow', 0)
+
+def check_pool_size(config, workers, threads):
+    '''
+    Raise PoolSizeError when `workers` processes could open more than
+    DB_MAX_CONNECTIONS connections between them. Returns warnings for
+    layouts that run but queue: fewer connections than threads in a worker,
+    or per-process page caches that other workers' writes can't invalidate.
+    '''
+    warnings = []
+    capacity = pool_capacity(config)
+    if capacity is not None:
+        total = workers * capacity
+        budget = config.get('DB_MAX_CONNECTIONS')
+        if budget is not None and total > budget:
+            raise PoolSizeError(
+                f'{workers} workers x (pool {config["DB_POOL_SIZE"]} + overflow '
+                f'{config["DB_MAX_OVERFLOW"]}) = {total} connections, over '
+                f'DB_MAX_CONNECTIONS={budget}; lower WEB_CONCURRENCY, DB_POOL_SIZE '
+                f'or DB_MAX_OVERFLOW'
+            )
+        if capacity < threads:
+            warnings.append(
+                f'{threads} threads per worker share {capacity} connections; '
+                f'requests will wait up to DB_POOL_TIMEOUT for one'
+            )
+
+    if workers > 1 and config.get('PAGE_CACHE_BACKEND') == 'memory':
+        warnings.append(
+            'PAGE_CACHE_BACKEND=memory keeps a cache per worker and a write only '
+            'invalidates its own, so other workers serve stale pages for up to '
+            'PAGE_CACHE_TTL; use filesystem to share it'
+        )
+    return warnings
+
+# Without SECRET_KEY in the environment config.py makes up a key per
+# process, so each worker signs sessions and flashed messages with its own
+# key, and a recycled worker (max_requests) with a new one. check_secret_key()
+# runs alongside check_pool_size().
+
+class SecretKeyError(Exception):
+    pass
+
+def check_secret_key(workers, environ=os.environ):
+    '''
+    Raise SecretKeyError when `workers` processes would each make up their
+    own SECRET_KEY. Returns warnings for a single worker, whose key still
+    changes whenever it is recycled.
+    '''
+    if environ.get('SECRET_KEY'):
+        return []
+    if workers > 1:
+        raise SecretKeyError(
+            f'{workers} workers would each sign sessions with a different random '
+            f'key; set SECRET_KEY or WEB_CONCURRENCY=1'
+        )
+    return ['SECRET_KEY is not set; sessions and flashed messages are lost '
+            'whenever the worker restarts']
+
+#----------------------------------------------------------------------------#
+# Statement timeout.
+#----------------------------------------------------------------------------#
+
+# DB_STATEMENT_TIMEOUT bounds what a web request can run, not the database
+# connection: each transaction a request begins, sync or async, on the
+# primary or a replica, starts with SET LOCAL statement_timeout. Migrations,
+# CLI jobs (backfills, recount-show-counts, compute-matches, purge) and
+# background purges run outside any request and so without a limit.
+
+@event.listens_for(Session, 'after_begin')
+def set_statement_timeout(session, transaction, connection):
+    if not has_request_context() or connection.dialect.name != 'postgresql':
+        return
+    timeout = current_app.config.get('DB_STATEMENT_TIMEOUT')
+    if timeout:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import counters
+
+def etag(client, path, **kwargs):
+    response = client.get(path, **kwargs)
+    # read the streamed body, which ends the request's transaction
+    response.get_data()
+    assert response.status_code == 200
+    assert 'Accept' in response.headers['Vary']
+    return response.headers['ETag']
+
+def test_not_modified(client, catalog):
+    tag = etag(client, '/api/v1/venues')
+    response = client.get('/api/v1/venues', headers={'If-None-Match': tag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == tag
+    assert 'Accept' in response.headers['Vary']
+
+def test_etag_moves_with_inserts_edits_and_deletes(client, catalog):
+    tags = [etag(client, '/api/v1/shows')]
+    client.post('/shows/create', data={'venue_id': '2', 'artist_id': '2', 'start_time': '2030-01-01 20:00:00'})
+    tags.append(etag(client, '/api/v1/shows'))
+    client.post('/batch/artists', json={'update': [{'id': 2, 'name': 'Renamed'}]})
+    tags.append(etag(client, '/api/v1/shows'))
+    client.delete('/venues/5')
+    tags.append(etag(client, '/api/v1/shows'))
+    assert len(set(tags)) == 4
+
+def test_etag_depends_on_the_representation(client, catalog):
+    assert etag(client, '/api/v1/artists') != etag(client, '/api/v1/artists?format=ndjson')
+    assert etag(client, '/api/v1/artists') != \
+        etag(client, '/api/v1/artists', headers={'Accept': 'application/x-ndjson'})
+
+def test_venue_etag_follows_the_show_counters(app, client, catalog):
+    tags = [etag(client, '/api/v1/venues')]
+    client.post('/shows/create', data={'venue_id': '2', 'artist_id': '2', 'start_time': '2030-01-01 20:00:00'})
+    tags.append(etag(client, '/api/v1/venues'))
+    with app.app_context():
+        counters.rollover(datetime.now() + timedelta(days=2))
+    tags.append(etag(client, '/api/v1/venues'))
+    assert len(set(tags)) == 3
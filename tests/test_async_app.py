@@ -0,0 +1,58 @@
+import asyncio
+from urllib.parse import urlencode
+
+import pytest
+
+import async_app
+
+# The ASGI app runs the sync views' statements on an async engine
+# (aiosqlite here), against the same test database, so each page has to
+# come out exactly as the Flask app renders it.
+
+async def asgi_request(method, path, query='', form=None):
+    body = urlencode(form or {}).encode()
+    headers = [(b'host', b'localhost')]
+    if form is not None:
+        headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': headers, 'scheme': 'http', 'root_path': ''}
+    try:
+        await async_app.app(scope, receive, send)
+    finally:
+        # pooled connections belong to this event loop
+        await async_app.engine.dispose()
+    return sent[0]['status'], sent[1]['body']
+
+def call(app, method, path, query='', form=None):
+    # a fresh app context, so g doesn't carry over from another request
+    with app.app_context():
+        return asyncio.run(asgi_request(method, path, query, form))
+
+@pytest.mark.parametrize('method, path, query, form', [
+    ('GET', '/venues', '', None),
+    ('GET', '/venues', 'per_page=2', None),
+    ('GET', '/venues', 'genre=Folk', None),
+    ('GET', '/shows', '', None),
+    ('POST', '/venues/search', '', {'search_term': 'venue'}),
+    ('POST', '/artists/search', '', {'search_term': 'artist 3'}),
+    ('POST', '/artists/search', '', {'search_term': ''}),
+])
+def test_async_pages_match_the_sync_app(app, client, catalog, method, path, query, form):
+    status, body = call(app, method, path, query, form)
+    assert status == 200
+    with app.app_context():
+        expected = client.open(f'{path}?{query}', method=method, data=form)
+    assert body == expected.get_data()
+
+def test_other_paths_are_left_to_the_sync_app(app, catalog):
+    status, _ = call(app, 'GET', '/venues/1')
+    assert status == 404
@@ -0,0 +1,53 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import bulk_export
+import counters
+from models import db, Venue, Show
+
+def read(path, format):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        if format == 'csv':
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f]
+
+def settled():
+    # an export `now` by which everything written so far has settled
+    return datetime.now() + bulk_export.SETTLE_TIME
+
+@pytest.mark.parametrize('format', ['csv', 'ndjson'])
+def test_full_export(app, catalog, tmp_path, format):
+    path, written = bulk_export.export_table('venues', tmp_path, format, now=settled())
+    rows = read(path, format)
+    assert written == len(rows) == 5
+    assert sorted(row['name'] for row in rows) == [f'Venue {i}' for i in range(1, 6)]
+    assert 'num_upcoming_shows' not in rows[0] and 'search_vector' not in rows[0]
+
+    path, written = bulk_export.export_table('shows', tmp_path, 'columnar', now=settled())
+    chunks = read(path, 'columnar')
+    assert written == sum(chunk['rows'] for chunk in chunks) == Show.query.count()
+
+def test_incremental_export_skips_counter_changes(app, catalog, tmp_path):
+    _, written = bulk_export.export_table('venues', tmp_path, incremental=True, now=settled())
+    assert written == 5
+
+    # a new show recounts venue 2, an edit renames venue 3
+    venue_ids = catalog['venues']
+    before = db.session.get(Venue, venue_ids[1]).updated_at
+    show = Show(venue_id=venue_ids[1], artist_id=catalog['artists'][1],
+                start_time=datetime.now() + timedelta(days=10))
+    db.session.add(show)
+    db.session.flush()
+    counters.record_show(show)
+    db.session.get(Venue, venue_ids[2]).name = 'Renamed'
+    db.session.commit()
+    assert db.session.get(Venue, venue_ids[1]).updated_at == before
+
+    path, written = bulk_export.export_table('venues', tmp_path, incremental=True, now=settled())
+    assert [row['name'] for row in read(path, 'csv')] == ['Renamed']
+    _, written = bulk_export.export_table('venues', tmp_path, incremental=True, now=settled())
+    assert written == 0
@@ -0,0 +1,65 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+import bulk_import
+from models import Show
+
+def ndjson(*rows):
+    return io.StringIO(''.join(f'{{"venue_id": {venue_id}, "artist_id": {artist_id}, '
+                               f'"start_time": "{start:%Y-%m-%d %H:%M:%S}"}}\n'
+                               for venue_id, artist_id, start in rows))
+
+def busy_slot():
+    # the busy venue and artist play every day at 20:00 for two hours
+    return datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=3)
+
+def import_shows(rows, batch_size=bulk_import.DEFAULT_BATCH_SIZE):
+    return bulk_import.import_rows('shows', ndjson(*rows), 'ndjson', batch_size)
+
+@pytest.mark.parametrize('batch_size', [1000, 4, 2, 1])
+def test_conflicts_rejected_per_row(app, catalog, monkeypatch, batch_size):
+    monkeypatch.setitem(app.config, 'SHOW_CONFLICTS', 'reject')
+    slot = busy_slot()
+    summary = import_shows([
+        (1, 5, slot + timedelta(minutes=30)),       # the venue is booked
+        (2, 2, slot + timedelta(days=30)),
+        (3, 3, slot + timedelta(days=30, hours=1)),
+        (3, 3, slot + timedelta(days=31)),
+        (4, 3, slot + timedelta(days=31, minutes=30)),  # artist 3, just above
+    ], batch_size)
+
+    # the last row overlaps the one before it, booked first however the
+    # rows are batched
+    assert summary['inserted'] == 3
+    assert [error['line'] for error in summary['errors']] == [1, 5]
+    assert 'venue already booked' in summary['errors'][0]['errors']['start_time'][0]
+    assert not Show.query.filter(Show.double_booked).count()
+
+@pytest.mark.parametrize('batch_size', [1000, 1])
+def test_rejected_rows_book_nothing(app, catalog, monkeypatch, batch_size):
+    monkeypatch.setitem(app.config, 'SHOW_CONFLICTS', 'reject')
+    slot = busy_slot()
+    summary = import_shows([
+        (1, 5, slot + timedelta(minutes=30)),  # the venue is booked
+        (2, 5, slot + timedelta(minutes=45)),  # artist 5, free once the above is rejected
+    ], batch_size)
+
+    assert summary['inserted'] == 1
+    assert [error['line'] for error in summary['errors']] == [1]
+
+@pytest.mark.parametrize('batch_size', [1000, 3, 1])
+def test_conflicts_flagged(app, catalog, monkeypatch, batch_size):
+    monkeypatch.setitem(app.config, 'SHOW_CONFLICTS', 'flag')
+    slot = busy_slot()
+    summary = import_shows([
+        (1, 5, slot + timedelta(minutes=30)),
+        (2, 2, slot + timedelta(days=30)),
+        (3, 3, slot + timedelta(days=31)),
+        (4, 3, slot + timedelta(days=31, minutes=30)),
+    ], batch_size)
+
+    assert summary == dict(summary, inserted=4, errors=[])
+    flagged = Show.query.filter(Show.double_booked).order_by(Show.start_time)
+    assert [(show.venue_id, show.artist_id) for show in flagged] == [(1, 5), (4, 3)]
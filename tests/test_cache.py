@@ -0,0 +1,101 @@
+import os
+import time
+from contextlib import contextmanager
+
+from flask import g, session
+
+from cache import FileSystemBackend, MemoryBackend, PageCache
+
+def test_filesystem_round_trip(tmp_path):
+    backend = FileSystemBackend(str(tmp_path))
+    backend.set('page:shows:1:/shows?', '<html>', ttl=60)
+    backend.set('generation:shows', 'abc')
+    assert backend.get('page:shows:1:/shows?') == '<html>'
+    assert backend.get('generation:shows') == 'abc'
+    assert backend.get('page:shows:2:/shows?') is None
+
+def test_sweep_removes_orphaned_pages(tmp_path, monkeypatch):
+    backend = FileSystemBackend(str(tmp_path), sweep_interval=60)
+    cache = PageCache()
+    cache.backend, cache.ttl = backend, 30
+
+    for generation in range(5):
+        cache.invalidate('shows')
+        token = cache.generation('shows')
+        cache.store(f'page:shows:{token}:/shows?', token, f'page {generation}')
+    # five generations of pages, only the last one reachable, and its token
+    assert len(os.listdir(tmp_path)) == 6
+
+    later = time.time() + 31
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert backend.sweep() == 5
+    assert os.listdir(tmp_path) == [os.path.basename(backend.path('generation:shows'))]
+
+def test_sweep_runs_on_set(tmp_path, monkeypatch):
+    backend = FileSystemBackend(str(tmp_path), sweep_interval=60)
+    backend.set('page:a', 'a', ttl=10)
+    later = time.time() + 61
+    monkeypatch.setattr(time, 'time', lambda: later)
+    backend.set('page:b', 'b', ttl=10)
+    assert backend.get('page:b') == 'b'
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_sweep_bounds_entries_and_drops_stale_temp_files(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), max_entries=3, sweep_interval=60)
+    for i in range(5):
+        backend.set(f'page:{i}', str(i), ttl=60)
+        written = time.time() - 100 + i
+        os.utime(backend.path(f'page:{i}'), (written, written))
+    stale = tmp_path / 'tmpcrashed'
+    stale.write_bytes(b'')
+    os.utime(stale, (time.time() - 120, time.time() - 120))
+
+    assert backend.sweep() == 3
+    assert [backend.get(f'page:{i}') for i in range(5)] == [None, None, '2', '3', '4']
+
+@contextmanager
+def request_context(app, path):
+    # a fresh app context too, so g doesn't carry over from another request
+    app_context = app.app_context()
+    app_context.push()
+    try:
+        with app.test_request_context(path):
+            yield
+    finally:
+        app_context.pop()
+
+def memory_cache():
+    cache = PageCache()
+    cache.backend, cache.ttl = MemoryBackend(), 60
+    return cache
+
+def test_sticky_users_bypass_the_cache(app):
+    cache = memory_cache()
+    with request_context(app, '/shows'):
+        assert cache.page_key('shows', {})[0] is not None
+        session['primary_until'] = time.time() + 10
+        assert cache.page_key('shows', {}) == (None, None)
+    with request_context(app, '/shows'):
+        g.wrote = True
+        assert cache.page_key('shows', {}) == (None, None)
+
+def test_replica_pages_wait_out_an_invalidation(app, monkeypatch):
+    cache = memory_cache()
+    cache.invalidate('shows')
+    with request_context(app, '/shows'):
+        g.read_replica = True
+        key, generation = cache.page_key('shows', {})
+        cache.store(key, generation, 'maybe stale')
+        assert cache.backend.get(key) is None
+
+        later = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        monkeypatch.setattr(time, 'time', lambda: later)
+        cache.store(key, generation, 'settled')
+        assert cache.backend.get(key) == 'settled'
+
+    cache.invalidate('shows')
+    with request_context(app, '/shows'):
+        # read from the primary
+        key, generation = cache.page_key('shows', {})
+        cache.store(key, generation, 'fresh')
+        assert cache.backend.get(key) == 'fresh'
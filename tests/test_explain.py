@@ -0,0 +1,16 @@
+import explain
+from app import page_cache
+from cache import MemoryBackend
+
+def test_no_seq_scans_on_watched_tables(app, catalog):
+    assert explain.explain_views(app, page_cache) == {}
+
+def test_views_run_their_queries_past_the_page_cache(app, catalog, monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(page_cache, 'backend', backend)
+    app.test_client().get('/shows')
+    assert not explain.capture_statements(app, 'GET', '/shows')
+
+    with page_cache.disabled():
+        assert explain.capture_statements(app, 'GET', '/shows')
+    assert page_cache.backend is backend
@@ -0,0 +1,28 @@
+from sqlalchemy.dialects import postgresql
+
+from filters import apply_filters
+from models import Venue
+from queries import venue_listing
+
+def genre_filters(*genres):
+    return {'genres': list(genres), 'state': None, 'city': None, 'seeking': False}
+
+def test_genres_compile_to_array_containment_on_postgres():
+    query = apply_filters(venue_listing(), Venue, genre_filters('Jazz', 'Folk'))
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert 'venues.genres @> ARRAY[' in sql
+
+def test_genre_filter_on_listings(client, catalog):
+    # catalog venues play Jazz and Folk, its artists only Jazz
+    assert len(client.get('/api/v1/venues?genre=Jazz&genre=Folk').get_json()) == 5
+    assert client.get('/api/v1/venues?genre=Jazz&genre=Blues').get_json() == []
+    assert len(client.get('/api/v1/artists?genre=Jazz').get_json()) == 5
+    assert client.get('/api/v1/artists?genre=Folk').get_json() == []
+    assert client.get('/venues?genre=Folk').status_code == 200
+    assert client.get('/artists?genre=Folk').status_code == 200
+
+def test_genre_filter_on_search(client, catalog):
+    response = client.post('/venues/search', data={'search_term': 'venue', 'genre': 'Folk'})
+    assert b'Venue 1' in response.data
+    response = client.post('/artists/search', data={'search_term': 'artist', 'genre': 'Folk'})
+    assert b'Artist 1' not in response.data
@@ -0,0 +1,21 @@
+import matchmaking
+from models import Match
+
+def test_block_size_fits_the_memory_budget():
+    budget = 256 * 2**20
+    for candidates in (1, 1000, 200000, 10**8):
+        size = matchmaking.block_size_for(candidates, budget)
+        assert size >= 1
+        assert size == 1 or size * candidates * matchmaking.BYTES_PER_PAIR <= budget
+    assert matchmaking.block_size_for(200000, budget) < 512
+    assert matchmaking.block_size_for(0, budget) >= 1
+
+def test_matches_do_not_depend_on_the_block_size(app, catalog):
+    def matches():
+        return sorted((m.kind, m.entity_id, m.rank, m.match_id, m.score) for m in Match.query)
+
+    roomy = matches()
+    assert roomy
+    # one subject per block
+    matchmaking.compute(app.config['MATCHES_PER_ENTITY'], memory_budget=1)
+    assert matches() == roomy
@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from models import db, Venue, Artist
+from pagination import decode_cursor, encode_cursor, keyset_page
+from queries import (
+    artist_listing,
+    venue_listing,
+    ARTIST_LISTING_ORDER,
+    SHOW_LISTING_ORDER,
+    VENUE_LISTING_ORDER
+)
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def test_cursor_round_trip():
+    row = type('Row', (), {'start_time': datetime(2030, 1, 1, 20), 'id': 7})
+    assert decode_cursor(encode_cursor(row, SHOW_LISTING_ORDER), SHOW_LISTING_ORDER) == [row.start_time, 7]
+
+@pytest.mark.parametrize('bad', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    cursor({'start_time': '2030-01-01'}),
+    cursor(['2030-01-01T20:00:00']),
+    cursor(['yesterday', 1]),
+    cursor([20300101, 1]),
+    cursor(['2030-01-01T20:00:00', '1']),
+    cursor(['2030-01-01T20:00:00', True]),
+    cursor(['2030-01-01T20:00:00', [1]]),
+    cursor([{'a': 1}, 1]),
+])
+def test_bad_cursor_is_ignored(bad):
+    assert decode_cursor(bad, SHOW_LISTING_ORDER) is None
+
+def test_bad_cursor_shows_first_page(client, catalog):
+    for path in ('/shows', '/artists'):
+        for bad in (cursor(['yesterday', 1]), cursor([['x'], {'y': 1}]), 'garbage'):
+            assert client.get(f'{path}?after={bad}').status_code == 200
+            assert client.get(f'{path}?before={bad}').status_code == 200
+
+def walk(query, columns, per_page):
+    # every page forwards, then every page back from the last one
+    pages, cursor = [], None
+    while True:
+        page = keyset_page(query, columns, after=cursor, per_page=per_page)
+        pages.append([row.id for row in page['items']])
+        if not page['next']:
+            break
+        cursor = page['next']
+    backwards, cursor = [], page['prev']
+    while cursor:
+        page = keyset_page(query, columns, before=cursor, per_page=per_page)
+        backwards.insert(0, [row.id for row in page['items']])
+        cursor = page['prev']
+    return pages, backwards + pages[-1:]
+
+def test_null_sort_keys_page_like_the_rest(app):
+    cities = [None, 'Austin', None, 'Boston', None, None, 'Austin']
+    states = [None, 'TX', 'CA', None, None, 'NY', None]
+    db.session.add_all([Venue(name=None if i % 3 == 0 else f'Venue {i}', city=city, state=state, genres=[])
+                        for i, (city, state) in enumerate(zip(cities, states))])
+    db.session.add_all([Artist(name=None if i % 2 else f'Artist {i}', genres=[]) for i in range(7)])
+    db.session.commit()
+
+    for query, columns in ((venue_listing(), VENUE_LISTING_ORDER), (artist_listing(), ARTIST_LISTING_ORDER)):
+        everything = [row.id for row in db.session.execute(query.order_by(*columns))]
+        forwards, backwards = walk(query, columns, per_page=2)
+        assert sum(forwards, []) == everything
+        assert backwards == forwards
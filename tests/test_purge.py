@@ -0,0 +1,59 @@
+import threading
+
+import counters
+import purge
+from conftest import BUSY_SHOWS
+from models import db, Venue, Artist, Show
+
+def counter_columns():
+    return [db.session.query(model.id, model.num_upcoming_shows, model.num_past_shows).order_by(model.id).all()
+            for model in (Venue, Artist)]
+
+def test_purge_keeps_counters_exact_per_batch(app, catalog):
+    remaining = []
+
+    def on_batch(purged):
+        # the venue's own counters follow its shows batch by batch
+        remaining.append((purge.show_count(Venue, 1), Show.query.filter_by(venue_id=1).count()))
+
+    assert purge.purge(Venue, 1, 30, on_batch=on_batch) == BUSY_SHOWS
+    assert remaining == [(70, 70), (40, 40), (10, 10), (0, 0)]
+    assert Venue.query.get(1) is None
+
+    kept = counter_columns()
+    counters.recount()
+    assert counter_columns() == kept
+
+def test_delete_entity_twice(app, client, catalog):
+    assert purge.delete_entity(Venue, 2)
+    db.session.commit()
+    assert not purge.delete_entity(Venue, 2)
+    assert client.delete('/venues/2').status_code == 404
+
+def test_purge_stops_when_deleted_meanwhile(app, catalog):
+    def delete_it(purged):
+        purge.delete_entity(Venue, 1)
+        db.session.commit()
+
+    assert purge.purge(Venue, 1, 30, on_batch=delete_it) == 30
+    kept = counter_columns()
+    counters.recount()
+    assert counter_columns() == kept
+
+def test_one_background_purge_per_entity(app, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(purge, 'purge', lambda *args: release.wait(5))
+
+    first = purge.purge_in_background(app, Artist, 7)
+    assert first is not None
+    assert purge.purge_in_background(app, Artist, 7) is None
+    other = purge.purge_in_background(app, Venue, 7)
+    assert other is not None
+
+    release.set()
+    first.join(5)
+    other.join(5)
+    again = purge.purge_in_background(app, Artist, 7)
+    assert again is not None
+    again.join(5)
+    assert not purge.purging
@@ -0,0 +1,86 @@
+import io
+
+import pytest
+
+from models import db, Venue
+
+# Statements per request, with the catalog fixture loaded. The budgets are
+# what the pages run today; raising one should be a deliberate choice, and
+# none of them may grow with the number of rows involved.
+
+VENUE = {
+    'name': 'The Lamp Post', 'city': 'Oakland', 'state': 'CA', 'address': '1 Broadway',
+    'phone': '415-555-0100', 'genres': ['Jazz'], 'image_link': 'https://example.com/lamp.jpg',
+    'facebook_link': 'https://facebook.com/lamppost', 'website_link': 'https://example.com',
+    'seeking_description': '',
+}
+ARTIST = {key: value for key, value in VENUE.items() if key != 'address'}
+
+READS = [
+    ('GET', '/', None, 0),
+    ('GET', '/venues', None, 1),
+    ('GET', '/artists', None, 1),
+    ('GET', '/shows', None, 1),
+    ('GET', '/venues/1', None, 4),
+    ('GET', '/artists/1', None, 4),
+    ('GET', '/venues/1/edit', None, 1),
+    ('GET', '/artists/1/edit', None, 1),
+    ('GET', '/venues/create', None, 0),
+    ('GET', '/artists/create', None, 0),
+    ('GET', '/shows/create', None, 0),
+    ('POST', '/venues/search', {'search_term': 'venue'}, 2),
+    ('POST', '/artists/search', {'search_term': 'artist'}, 2),
+    ('GET', '/api/v1/shows', None, 2),
+    ('GET', '/api/v1/venues', None, 2),
+    ('GET', '/api/v1/artists', None, 2),
+]
+
+WRITES = [
+    ('POST', '/venues/create', VENUE, 1),
+    ('POST', '/artists/create', ARTIST, 1),
+    ('POST', '/shows/create', {'venue_id': '2', 'artist_id': '2', 'start_time': '2030-01-01 20:00:00'}, 8),
+    ('POST', '/venues/2/edit', VENUE, 4),
+    ('POST', '/artists/2/edit', ARTIST, 4),
+    ('DELETE', '/venues/3', None, 13),
+    ('DELETE', '/artists/3', None, 13),
+]
+
+def request_ids(calls):
+    return [f'{method} {path}' for method, path, _, _ in calls]
+
+@pytest.mark.parametrize('method, path, data, limit', READS + WRITES, ids=request_ids(READS + WRITES))
+def test_query_budget(client, catalog, query_budget, method, path, data, limit):
+    with query_budget(limit, per_statement=1):
+        response = client.open(path, method=method, data=data)
+        # streamed responses (the API) run their queries as they're read
+        response.get_data()
+    assert response.status_code in (200, 302)
+
+def test_batch_create_shows(client, catalog, query_budget):
+    # under NPLUSONE_THRESHOLD, as SQLite flushes one INSERT per show
+    shows = [{'venue_id': 4, 'artist_id': 4, 'start_time': f'2031-01-{day:02} 20:00:00'} for day in range(1, 9)]
+    with query_budget(len(shows) + 9) as statements:
+        response = client.post('/batch/shows', json={'create': shows})
+    assert response.status_code == 200
+    # the conflict checks and every other SELECT run once for the batch
+    assert all(n == 1 for sql, n in statements.items() if sql.startswith('SELECT'))
+
+def test_batch_venues(client, catalog, query_budget):
+    payload = {'create': [VENUE] * 3, 'update': [{'id': 4, 'name': 'Renamed'}, {'id': 5, 'city': 'Berkeley'}]}
+    with query_budget(8, per_statement=3):
+        response = client.post('/batch/venues', json=payload)
+    assert response.status_code == 200
+
+def test_import_shows(client, catalog, query_budget):
+    lines = '\n'.join(f'{{"venue_id": 5, "artist_id": 5, "start_time": "2032-01-{day:02} 20:00:00"}}'
+                      for day in range(1, 9))
+    upload = {'file': (io.BytesIO(lines.encode()), 'shows.ndjson')}
+    with query_budget(15, per_statement=2):
+        response = client.post('/import/shows', data=upload, content_type='multipart/form-data')
+    assert response.get_json() == {'inserted': 8, 'errors': []}
+
+def test_budget_overrun_fails(app, query_budget):
+    with pytest.raises(AssertionError, match='2 statements'):
+        with query_budget(1):
+            db.session.query(Venue).all()
+            db.session.query(Venue).count()
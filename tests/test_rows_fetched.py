@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from conftest import BUSY_SHOWS
+from models import db, Venue, Artist
+
+# Every page reads a bounded number of rows however many shows a venue or
+# an artist has: the listings read one keyset page, the detail pages their
+# capped show slices and matches. The counts come from the ORM results the
+# views execute, so they hold on SQLite too, where cursor.rowcount doesn't.
+
+@contextmanager
+def rows_fetched():
+    fetched = []
+
+    def count_rows(orm_execute_state):
+        frozen = orm_execute_state.invoke_statement().freeze()
+        fetched.append(len(frozen.data))
+        return frozen()
+
+    event.listen(Session, 'do_orm_execute', count_rows)
+    try:
+        yield fetched
+    finally:
+        event.remove(Session, 'do_orm_execute', count_rows)
+
+def page_budget(config):
+    # one keyset page plus the row that tells whether there's a next one
+    return config['PAGE_SIZE'] + 1
+
+def detail_budget(config):
+    # the entity, its upcoming and past show slices, its matches
+    return (1 + config['DETAIL_UPCOMING_SHOWS_LIMIT'] + config['DETAIL_PAST_SHOWS_LIMIT']
+            + config['MATCHES_PER_ENTITY'])
+
+def search_budget(config):
+    # the total and one page of results
+    return 1 + config['SEARCH_PAGE_SIZE']
+
+ENDPOINTS = [
+    ('GET', '/venues', page_budget),
+    ('GET', '/artists', page_budget),
+    ('GET', '/shows', page_budget),
+    ('GET', '/venues/1', detail_budget),
+    ('GET', '/artists/1', detail_budget),
+    ('GET', '/venues/1/edit', lambda config: 1),
+    ('GET', '/artists/1/edit', lambda config: 1),
+    ('POST', '/venues/search', search_budget),
+    ('POST', '/artists/search', search_budget),
+]
+
+@pytest.mark.parametrize('method, path, budget', ENDPOINTS, ids=[path for _, path, _ in ENDPOINTS])
+def test_rows_fetched(app, client, catalog, method, path, budget):
+    limit = budget(app.config)
+    assert limit < BUSY_SHOWS
+
+    with rows_fetched() as fetched:
+        response = client.open(path, method=method, data={'search_term': ''})
+    assert response.status_code == 200
+    assert 0 < sum(fetched) <= limit, f'{path} fetched {sum(fetched)} rows ({fetched}), budget {limit}'
+
+@pytest.mark.parametrize('model, path', [(Venue, '/venues/1'), (Artist, '/artists/1')])
+def test_detail_totals_cover_every_show(client, catalog, model, path):
+    # the pages fetch capped slices but count every show, from the counters
+    entity = db.session.get(model, 1)
+    assert entity.num_upcoming_shows + entity.num_past_shows == BUSY_SHOWS
+    page = client.get(path).get_data(as_text=True)
+    assert f'{entity.num_upcoming_shows} Upcoming Shows' in page
+    assert f'{entity.num_past_shows} Past Shows' in page
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduling
+from models import Show
+
+def show(venue_id, artist_id, start, minutes=60):
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start,
+            'end_time': start + timedelta(minutes=minutes)}
+
+def test_overlapping_pairs_follows_start_times():
+    day = datetime(2030, 1, 1)
+    rows = [
+        show(1, 1, day.replace(hour=10)),
+        show(1, 2, day.replace(hour=12)),
+        show(1, 3, day.replace(hour=10, minute=30)),
+    ]
+    assert set(scheduling.overlapping_pairs(rows)) == {(0, 2)}
+
+def test_overlapping_pairs_back_to_back_and_per_resource():
+    day = datetime(2030, 1, 1, 20)
+    rows = [
+        show(1, 1, day),
+        show(1, 2, day + timedelta(minutes=60)),
+        show(2, 1, day + timedelta(minutes=30)),
+        show(3, 3, day),
+    ]
+    # back to back at venue 1 is fine; artist 1 plays two venues at once
+    assert set(scheduling.overlapping_pairs(rows)) == {(0, 2)}
+
+def test_conflicts_many_matches_conflicts(app, catalog):
+    # the busy venue and artist play every day at 20:00 for two hours
+    start = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=3)
+    rows = [
+        show(1, 5, start + timedelta(minutes=30)),
+        show(5, 1, start - timedelta(minutes=30)),
+        show(1, 1, start + timedelta(hours=2)),
+        show(2, 2, start + timedelta(days=400)),
+        show(3, 4, start - timedelta(days=2) - timedelta(hours=1), minutes=24 * 60),
+    ]
+    found = scheduling.conflicts_many(rows)
+    for i, row in enumerate(rows):
+        expected = scheduling.conflicts(row['venue_id'], row['artist_id'], row['start_time'], row['end_time'])
+        assert [(resource, s.id) for resource, s in found.get(i, [])] == \
+            [(resource, s.id) for resource, s in expected]
+    assert sorted(found) == [0, 1, 4]
+
+def test_end_time_rejects_durations_out_of_range():
+    start = datetime(2030, 1, 1, 20)
+    assert scheduling.end_time(start) == start + timedelta(hours=2)
+    assert scheduling.end_time(start, 24 * 60) == start + scheduling.MAX_DURATION
+    for minutes in (0, -30, 24 * 60 + 1):
+        with pytest.raises(ValueError):
+            scheduling.end_time(start, minutes)
+
+def test_create_show_rejects_durations_out_of_range(client, catalog):
+    before = Show.query.count()
+    for duration in ('0', '-30', str(24 * 60 + 1)):
+        response = client.post('/shows/create', data={'venue_id': '2', 'artist_id': '2',
+                                                      'start_time': '2030-01-01 20:00:00',
+                                                      'duration': duration})
+        assert response.status_code == 200
+        assert b'Errors' in response.data
+    assert Show.query.count() == before
+    client.post('/shows/create', data={'venue_id': '2', 'artist_id': '2',
+                                       'start_time': '2030-01-01 20:00:00', 'duration': '90'})
+    assert Show.query.count() == before + 1
@@ -0,0 +1,24 @@
+from models import db, Venue
+from search import search
+
+def test_best_match_is_kept_past_the_cap(app):
+    # the exact name sorts after every partial match by name and id
+    db.session.add_all([Venue(name=f'Abc Jazz Club {i:03}', city='Oakland', state='CA')
+                        for i in range(300)])
+    db.session.add(Venue(name='Jazz', city='Oakland', state='CA'))
+    db.session.commit()
+
+    results = search(Venue, 'jazz', cap=200)
+    assert results['capped']
+    assert results['count'] == 200
+    assert results['data'][0].name == 'Jazz'
+
+def test_empty_term_keeps_the_first_names(app):
+    db.session.add_all([Venue(name=f'Venue {i:03}', city='Oakland', state='CA')
+                        for i in reversed(range(300))])
+    db.session.commit()
+
+    results = search(Venue, '', per_page=10, cap=200)
+    assert [row.name for row in results['data']] == [f'Venue {i:03}' for i in range(10)]
+    last = search(Venue, '', page=20, per_page=10, cap=200)
+    assert last['data'][-1].name == 'Venue 199'
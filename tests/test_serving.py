@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+
+from serving import check_secret_key, set_statement_timeout, SecretKeyError
+
+class Connection:
+    def __init__(self, dialect):
+        self.dialect = SimpleNamespace(name=dialect)
+        self.statements = []
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+
+def test_statement_timeout_applies_to_requests_only(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'DB_STATEMENT_TIMEOUT', 30000)
+    connection = Connection('postgresql')
+    # a CLI command or migration
+    set_statement_timeout(None, None, connection)
+    assert connection.statements == []
+
+    with app.test_request_context('/venues'):
+        set_statement_timeout(None, None, connection)
+        set_statement_timeout(None, None, Connection('sqlite'))
+    assert connection.statements == ['SET LOCAL statement_timeout = 30000']
+
+    monkeypatch.setitem(app.config, 'DB_STATEMENT_TIMEOUT', 0)
+    with app.test_request_context('/venues'):
+        set_statement_timeout(None, None, connection)
+    assert len(connection.statements) == 1
+
+def test_workers_need_a_shared_secret_key():
+    with pytest.raises(SecretKeyError):
+        check_secret_key(4, {})
+    assert check_secret_key(4, {'SECRET_KEY': 'shared'}) == []
+    # one worker runs, but its key changes when it is recycled
+    assert len(check_secret_key(1, {})) == 1
@@ -0,0 +1,3 @@
+from app import app
+
+# WSGI entry point for production servers, e.g. gunicorn -c gunicorn.conf.py wsgi:app